@@ -0,0 +1,77 @@
+"""Micro-benchmark: single-pass EffectTranslator against the previous one-regex-per-rule loop.
+
+Run from the project root:  python -m Benchmarks.effect_translator_benchmark
+"""
+import json
+import os
+import re
+import time
+
+from Code.Translator import EffectTranslator
+from Code.config import Paths
+
+EFFECT_DICTIONARY = './PatternDictionaries/EffectDictionary.json'
+REPEAT = 5
+
+class LegacyEffectTranslator:
+    """The previous implementation: one full re.sub scan per rule, longest pattern first."""
+    def __init__(self, path=EFFECT_DICTIONARY):
+        with open(path, 'r', encoding='utf8') as f:
+            raw_dict = json.load(f)
+        self.replacements = sorted(
+            [(re.compile(re.escape(k)), v) for k, v in raw_dict.items()],
+            key=lambda x: len(x[0].pattern),
+            reverse=True
+        )
+
+    def translate(self, text):
+        result = text
+        for pattern, replacement in self.replacements:
+            result = pattern.sub(replacement, result)
+        return result
+
+def load_descriptions():
+    # Prefer the real command data (datamined into Updated_Files, or kept in Source after an update)
+    for folder in (Paths.UPDATED_FILES_DIR, Paths.SOURCE_DIR):
+        path = os.path.join(folder, 'command.json')
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf8') as f:
+                texts = [entry.get('description_effect') for entry in json.load(f)]
+            return path, [t for t in texts if isinstance(t, str) and t]
+
+    # Fall back to the JP leader skill descriptions shipped with the repo
+    path = os.path.join(Paths.SOURCE_DIR, 'leaderskill.json')
+    with open(path, 'r', encoding='utf8') as f:
+        texts = [entry.get('description') for entry in json.load(f)]
+    return path, [t for t in texts if isinstance(t, str) and t]
+
+def time_translator(translator, texts):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for text in texts:
+            translator.translate(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    source, texts = load_descriptions()
+    legacy = LegacyEffectTranslator()
+    current = EffectTranslator(EFFECT_DICTIONARY)
+
+    mismatches = [t for t in texts if legacy.translate(t) != current.translate(t)]
+
+    legacy_time = time_translator(legacy, texts)
+    current_time = time_translator(current, texts)
+
+    print(f"Data: {len(texts)} descriptions from {source}, {len(current.replacements)} rules, best of {REPEAT}")
+    print(f"  Legacy loop:  {legacy_time * 1000:.1f} ms ({legacy_time / len(texts) * 1e6:.1f} µs/description)")
+    print(f"  Single pass:  {current_time * 1000:.1f} ms ({current_time / len(texts) * 1e6:.1f} µs/description)")
+    print(f"  Speedup:      {legacy_time / current_time:.2f}x")
+    print(f"  Output mismatches: {len(mismatches)}")
+    for text in mismatches[:10]:
+        print(f"    {text!r}: {legacy.translate(text)!r} != {current.translate(text)!r}")
+
+if __name__ == "__main__":
+    main()
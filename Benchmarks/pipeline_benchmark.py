@@ -0,0 +1,307 @@
+"""Offline benchmark of every pipeline stage on synthetic masters.
+
+Runs without the game or DeepL/Google: masters are generated from the repo's own data volume
+(scale 1 = today's entry counts) and the translation engines are stubs with a fixed latency per
+request. Results are written as JSON so runs of different versions can be compared.
+
+Run from the project root:
+    python -m Benchmarks.pipeline_benchmark --scales 1,10,100 --latency 0.05
+    python -m Benchmarks.pipeline_benchmark --compare old_results.json
+    python -m Benchmarks.pipeline_benchmark --compression legacy,none
+    python -m Benchmarks.pipeline_benchmark --bundle path/to/masters/tower   (generation timed on a real master)
+
+Bundle generation runs on a synthetic master bundle (the command master built on a texture bundle from
+Global_Assets, see SyntheticData.master_bundle) unless --bundle gives a real one.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from Benchmarks.synthetic import FILE_FIELDS, TEMPLATE_BUNDLE, SyntheticData, write_json
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the translation pipeline on synthetic data.")
+    parser.add_argument('--scales', default='1,10', help="Comma separated data volume multipliers (default: 1,10)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds per stub translation request (default: 0)")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="Requests per second allowed per engine by the scheduler (default: 0, no limit)")
+    parser.add_argument('--hit-ratio', type=float, default=0.3, help="Share of texts found in the dictionaries (default: 0.3)")
+    parser.add_argument('--change-ratio', type=float, default=0.05, help="Share of entries edited for the change detection stage")
+    parser.add_argument('--bundle', help="A real master bundle used as fixture for generate_translated_game_files "
+                                         "instead of the synthetic one")
+    parser.add_argument('--compression', default='legacy,original,lz4,none',
+                        help="Comma separated bundle compression modes timed for generate_translated_game_files (default: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the results")
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    parser.add_argument('--keep', action='store_true', help="Keep the temporary workspace")
+    return parser.parse_args()
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+class Benchmark:
+    def __init__(self, args, workspace):
+        self.args = args
+        self.workspace = workspace
+        self.results = []
+
+    def record(self, stage, scale, seconds, **info):
+        result = {"stage": stage, "scale": scale, "seconds": round(seconds, 6), **info}
+        self.results.append(result)
+        details = ", ".join(f"{k}={v}" for k, v in info.items())
+        print(f"   ├─ {stage:<32} x{scale:<5} {seconds:8.3f}s  {details}")
+
+    def timed(self, stage, scale, fn, **info):
+        start = time.perf_counter()
+        value = fn()
+        self.record(stage, scale, time.perf_counter() - start, **info)
+        return value
+
+    def prepare_project(self, scale):
+        """Fresh project folder for one scale, with the real dictionaries."""
+        project = os.path.join(self.workspace, f"project_x{scale}")
+        shutil.rmtree(project, ignore_errors=True)
+        os.makedirs(project)
+        for folder in ('Dictionaries', 'PatternDictionaries'):
+            shutil.copytree(os.path.join(PROJECT_ROOT, folder), os.path.join(project, folder))
+        from Code.config import Paths
+        for folder in (Paths.SOURCE_DIR, Paths.SOURCE_TRANSLATED_DIR, Paths.UPDATED_FILES_DIR,
+                       Paths.NEW_ENTRIES_DIR, Paths.TRANSLATED_FILES_DIR, Paths.MASTERS_BACKUP):
+            os.makedirs(os.path.join(project, folder), exist_ok=True)
+        shutil.rmtree(Paths.GAME_MASTERS, ignore_errors=True)
+        os.makedirs(Paths.GAME_MASTERS)
+        os.chdir(project)
+
+    def run_scale(self, scale):
+        from Code.config import Config, Paths
+        from Code.Translator import DictionaryTranslator, EffectTranslator
+        from Benchmarks.stubs import StubTranslatorUtil
+
+        # The stubs don't need protecting, only throttle them when asked to
+        Config.ENGINE_RATE_LIMITS = {engine: self.args.rate or 1e9 for engine in ("deepl", "google")}
+
+        print(f"\n ℹ️ Scale x{scale}")
+        self.prepare_project(scale)
+        data = SyntheticData(PROJECT_ROOT, seed=self.args.seed, hit_ratio=self.args.hit_ratio)
+
+        # Synthetic JP masters, as datamined into Updated_Files
+        jp = {name: data.entries(name, scale) for name in FILE_FIELDS if name != 'character'}
+        jp['character'] = data.characters(scale, len(jp['leaderskill']))
+        for name, entries in jp.items():
+            write_json(entries, os.path.join(Paths.UPDATED_FILES_DIR, f'{name}.json'))
+        write_json(data.charactercommands(len(jp['command']), len(jp['character'])),
+                   os.path.join(Paths.UPDATED_FILES_DIR, 'charactercommand.json'))
+
+        # Dictionary lookups. The first build compiles the snapshot, the next ones load it
+        from Code.DictionarySnapshot import DictionarySnapshot
+        self.timed("DictionarySnapshot (compile)", scale, lambda: DictionarySnapshot().compile())
+        dictionary = self.timed("DictionaryTranslator (snapshot)", scale, DictionaryTranslator)
+        texts = [entry[field] for name, entries in jp.items() for entry in entries
+                 for field in FILE_FIELDS[name] if field != 'description_effect']
+        hits = self.timed("DictionaryTranslator", scale,
+                          lambda: sum(1 for text in texts if dictionary.has(text) and dictionary.translate(text)),
+                          lookups=len(texts))
+        self.results[-1]["hits"] = hits
+        # The same texts with the noise seen in game data: full-width ASCII and stray spaces/line breaks
+        full_width = {code: code + 0xFEE0 for code in range(0x21, 0x7F)}
+        noisy = [f" {text.translate(full_width)}\n" for text in texts]
+        hits = self.timed("DictionaryTranslator (noisy)", scale,
+                          lambda: sum(1 for text in noisy if dictionary.has(text) and dictionary.translate(text)),
+                          lookups=len(noisy))
+        self.results[-1]["hits"] = hits
+
+        # Effect descriptions
+        effects = EffectTranslator()
+        effect_texts = [entry['description_effect'] for entry in jp['command']]
+        self.timed("EffectTranslator", scale, lambda: [effects.translate(text) for text in effect_texts],
+                   descriptions=len(effect_texts))
+
+        # Whole update translation, one file at a time vs. TRANSLATION_FILE_WORKERS files at once. Each run
+        # starts from an empty Source_Translated and translation memory
+        from Code.TranslationMemory import TranslationMemory
+        file_workers = Config.TRANSLATION_FILE_WORKERS
+        Config.set_updated_files(jp)
+        for workers in sorted({1, file_workers}):
+            Config.TRANSLATION_FILE_WORKERS = workers
+            util = StubTranslatorUtil(self.args.latency)
+            util.translator.memory = TranslationMemory(os.path.join('Cache', f'memory_files_x{workers}.db'))
+            self.timed("translate_updated_files", scale, util.translate_updated_files, file_workers=workers)
+            for name in os.listdir(Paths.SOURCE_TRANSLATED_DIR):
+                os.remove(os.path.join(Paths.SOURCE_TRANSLATED_DIR, name))
+            # The files done with are removed from Updated_Files
+            for name, entries in jp.items():
+                write_json(entries, os.path.join(Paths.UPDATED_FILES_DIR, f'{name}.json'))
+        Config.TRANSLATION_FILE_WORKERS = file_workers
+
+        # New entries: translate every file from scratch with the stub engines
+        util = StubTranslatorUtil(self.args.latency)
+        engine = util.translator.translator_google
+        for name in ('leaderskill', 'character', 'command', 'trophy', 'item'):
+            requests, characters = engine.requests, engine.characters
+            self.timed("__translate_file", scale,
+                       lambda: util._Translator_Util__translate_file(filename=f'{name}.json', path=Paths.UPDATED_FILES_DIR),
+                       file=name, entries=len(jp[name]))
+            self.results[-1].update(requests=engine.requests - requests, characters_sent=engine.characters - characters)
+
+        # Reading the translated files back: full JSON parse vs. the compiled cache (first read compiles)
+        from Code.TranslatedCache import TranslatedCache
+        cache = TranslatedCache()
+        for name in ('leaderskill', 'command'):
+            json_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, f'{name}.json')
+            def load_json():
+                with open(json_path, 'r', encoding='utf8') as f:
+                    return json.load(f)
+            self.timed("load Source_Translated (json)", scale, load_json, file=name)
+            self.timed("load Source_Translated (compile)", scale, lambda: cache.compile(name), file=name)
+            self.timed("load Source_Translated (cache)", scale, lambda: cache.load(name), file=name)
+
+        # Changed JP text in existing entries: the field hash store finds them, __translate_file re-translates them
+        from Code.FieldHashStore import FieldHashStore
+        util = StubTranslatorUtil(self.args.latency)
+        for name in ('leaderskill', 'command', 'trophy', 'item'):
+            changed = data.change_entries(jp[name], FILE_FIELDS[name], self.args.change_ratio)
+            write_json(changed, os.path.join(Paths.UPDATED_FILES_DIR, f'{name}.json'))
+            changes = self.timed("FieldHashStore.diff", scale, lambda: FieldHashStore().diff(name, changed),
+                                 file=name, entries=len(changed))
+            self.results[-1]["changed"] = len(changes)
+            self.timed("__translate_file (changed fields)", scale,
+                       lambda: util._Translator_Util__translate_file(filename=f'{name}.json', path=Paths.UPDATED_FILES_DIR),
+                       file=name, entries=len(changed))
+
+        bundle_count = len(Config.FILES_TO_TRANSLATE) * scale
+        if self.args.bundle:
+            self.run_generate(scale, bundle_count, self.args.bundle)
+        else:
+            fixture = os.path.join(self.workspace, f"fixture_x{scale}", 'command')
+            data.master_bundle('command', jp['command'], fixture)
+            print(f"   ├─ ℹ️ Bundle fixture: synthetic command master ({len(jp['command'])} entries) "
+                  f"built on {TEMPLATE_BUNDLE}, pass --bundle to time a real one")
+            self.run_generate(scale, bundle_count, fixture)
+
+        installed = sum(os.path.getsize(os.path.join(Paths.TRANSLATED_FILES_DIR, f)) for f in os.listdir(Paths.TRANSLATED_FILES_DIR))
+        self.timed("update_game_files", scale, lambda: util.update_game_files(), bundles=bundle_count, bytes=installed)
+        self.timed("update_game_files (unchanged)", scale, lambda: util.update_game_files(), bundles=bundle_count, bytes=installed)
+
+    def run_generate(self, scale, bundle_count, bundle):
+        """Time generate_translated_game_files on copies of a master bundle."""
+        from Code.config import Config, Paths
+        from Code.FileHash import file_digest, file_signature
+        from Code.MasterIndex import MasterIndex
+        from Code.UnityHelper import UnityHelper
+        import UnityPy
+
+        template_name = os.path.basename(bundle)
+        shutil.copy2(bundle, os.path.join(Paths.GAME_MASTERS, template_name))
+        location = MasterIndex().lookup([template_name]).get(template_name)
+        if location is None:
+            self.results.append({"stage": "generate_translated_game_files", "scale": scale, "skipped": f"{template_name} not found in fixture"})
+            return
+
+        # Translated data for the fixture: every text field gets an EN marker
+        env = UnityPy.load(location["bundle"])
+        obj = next(obj for obj in env.objects if obj.path_id == location["path_id"])
+        translated = obj.read_typetree()['DataList']
+        for entry in translated:
+            for field in Config.FIELDS_TO_TRANSLATE:
+                if isinstance(entry.get(field), str):
+                    entry[field] = f"EN {entry[field]}"
+
+        # One copy of the bundle per translated master, registered in the index under its own name
+        index = MasterIndex()
+        names = [f"{template_name}_{i}" for i in range(bundle_count)]
+        for name in names:
+            bundle_path = os.path.join(Paths.GAME_MASTERS, name)
+            shutil.copy2(bundle, bundle_path)
+            write_json(translated, os.path.join(Paths.SOURCE_TRANSLATED_DIR, f'{name}.json'))
+            index.bundles[name] = {"signature": file_signature(bundle_path), "hash": file_digest(bundle_path),
+                                   "objects": [{"name": name, "path_id": location["path_id"], "type": location["type"]}]}
+        index.dirty = True
+        index.save()
+
+        files_to_translate = Config.FILES_TO_TRANSLATE
+        compression = Config.BUNDLE_COMPRESSION
+        Config.FILES_TO_TRANSLATE = names
+        try:
+            # Same bundles saved with each compression mode: generation time and size of the outputs
+            for mode in self.args.compression.split(','):
+                Config.BUNDLE_COMPRESSION = mode
+                self.timed(f"generate_translated_game_files ({mode})", scale,
+                           lambda: UnityHelper().generate_translated_game_files(),
+                           bundles=bundle_count, entries_per_bundle=len(translated),
+                           fixture="synthetic" if self.args.bundle is None else template_name)
+                self.results[-1]["bytes"] = sum(os.path.getsize(os.path.join(Paths.TRANSLATED_FILES_DIR, name))
+                                                for name in os.listdir(Paths.TRANSLATED_FILES_DIR))
+        finally:
+            Config.FILES_TO_TRANSLATE = files_to_translate
+            Config.BUNDLE_COMPRESSION = compression
+
+def compare(results, previous_path):
+    with open(previous_path, 'r', encoding='utf8') as f:
+        previous = json.load(f)
+    def key(result):
+        return (result["stage"], result["scale"], result.get("file"))
+    old = {key(r): r for r in previous["results"] if "seconds" in r}
+    print(f"\n ℹ️ Compared with {previous_path} ({previous['meta'].get('revision')})")
+    for result in results:
+        before = old.get(key(result))
+        if before is None or "seconds" not in result or not before["seconds"]:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        label = f"{result['stage']} {result.get('file', '')}".strip()
+        print(f"   ├─ {label:<40} x{result['scale']:<5} {before['seconds']:8.3f}s -> {result['seconds']:8.3f}s ({ratio:.2f}x)")
+
+def main():
+    args = parse_args()
+    scales = [int(s) for s in args.scales.split(',')]
+    output = os.path.abspath(args.output)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    bundle = os.path.abspath(args.bundle) if args.bundle else None
+    args.bundle = bundle
+
+    # The game folder is derived from LOCALAPPDATA when Code.config is imported, point it at the workspace
+    workspace = tempfile.mkdtemp(prefix="drpg_bench_")
+    os.environ["LOCALAPPDATA"] = os.path.join(workspace, "AppData", "Local")
+
+    benchmark = Benchmark(args, workspace)
+    cwd = os.getcwd()
+    try:
+        for scale in scales:
+            benchmark.run_scale(scale)
+    finally:
+        os.chdir(cwd)
+        if not args.keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "date": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": benchmark.results,
+    }
+    with open(output, 'w', encoding='utf8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n ✅ Results written to {output}")
+
+    if compare_path:
+        compare(benchmark.results, compare_path)
+
+if __name__ == "__main__":
+    main()
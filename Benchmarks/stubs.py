@@ -0,0 +1,62 @@
+"""Offline stand-ins for the machine translation engines.
+
+Import this only after the benchmark workspace is set up: the Code modules resolve their paths
+(and the game folder from LOCALAPPDATA) at import time."""
+import threading
+import time
+
+from Code.FieldHashStore import FieldHashStore
+from Code.Helper import Helper
+from Code.MastersManifest import MastersManifest
+from Code.TranslatedCache import TranslatedCache
+from Code.TranslationMemory import TranslationMemory
+from Code.TranslationPlanner import TranslationPlanner
+from Code.TranslationUtil import Translator_Util
+from Code.Translator import DictionaryTranslator, EffectTranslator, Translator
+
+class StubEngine:
+    """Fake DeepL/Google client. Every request costs `latency` seconds, whatever its size."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.characters = 0
+        self._lock = threading.Lock()
+
+    def __record(self, texts):
+        with self._lock:
+            self.requests += 1
+            self.characters += sum(len(text) for text in texts)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def translate(self, text):
+        self.__record([text])
+        return f"EN {text}"
+
+    def translate_batch(self, texts):
+        self.__record(texts)
+        return [f"EN {text}" for text in texts]
+
+class StubTranslator(Translator):
+    def __init__(self, latency=0.0):
+        self.dict_translator = DictionaryTranslator()
+        self.effect_translator = EffectTranslator()
+        self.memory = TranslationMemory()
+        self.files_for_deepl = []
+        self.stub_engine = StubEngine(latency)
+        self.translator_deepl = None
+        self.scheduler = self._build_scheduler()
+
+    @property
+    def translator_google(self):
+        # The stub is thread-safe, every thread shares it so its counters cover the whole run
+        return self.stub_engine
+
+class StubTranslatorUtil(Translator_Util):
+    def __init__(self, latency=0.0):
+        self.translator = StubTranslator(latency)
+        self.helper = Helper()
+        self.manifest = MastersManifest()
+        self.cache = TranslatedCache()
+        self.field_hashes = FieldHashStore()
+        self.planner = TranslationPlanner(self.translator, self.cache, self.field_hashes)
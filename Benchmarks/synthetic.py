@@ -0,0 +1,183 @@
+"""Synthetic master data for the benchmarks.
+
+Entry counts at scale 1 are taken from the data shipped in the repo, so 10x/100x mean ten and a
+hundred times today's volume. Text mixes dictionary/effect keys (local hits) with random JP
+strings (misses that go to the machine translation engine)."""
+import copy
+import json
+import os
+import random
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+KATAKANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲン"
+
+LEADER_SKILL_FIELDS = (
+    "m_leader_skill_id", "additional_m_leader_skill_id",
+    "m_leader_skill_id_sub_1", "additional_m_leader_skill_id_sub_1",
+    "m_leader_skill_id_sub_2", "additional_m_leader_skill_id_sub_2",
+    "m_leader_skill_id_sub_3", "additional_m_leader_skill_id_sub_3",
+)
+
+# Translated fields generated for each benchmarked master
+FILE_FIELDS = {
+    'leaderskill': ('name', 'description'),
+    'character': ('name',),
+    'command': ('name', 'description', 'description_effect'),
+    'trophy': ('title', 'description'),
+    'item': ('name', 'description'),
+}
+
+# Used when the repo doesn't ship the file (command is only available after datamining)
+DEFAULT_BASE_COUNTS = {'command': 1344}
+
+# Real Unity bundle shipped in the repo (a texture) that synthetic master bundles are built on
+TEMPLATE_BUNDLE = os.path.join('Global_Assets', 'images', 'unique_innocent_tag', 'spear')
+# TypeTreeNode.m_MetaFlag bit: the value is followed by padding to 4 bytes
+ALIGN_BYTES = 0x4000
+
+class SyntheticData:
+    def __init__(self, project_root, seed=0, hit_ratio=0.3):
+        self.project_root = project_root
+        self.random = random.Random(seed)
+        self.hit_ratio = hit_ratio
+        self.dictionary_keys = self.__load_keys(os.path.join(project_root, 'Dictionaries'))
+        self.effect_keys = self.__load_keys(os.path.join(project_root, 'PatternDictionaries'))
+        self.base_counts = self.__load_base_counts(project_root)
+        self.serial = 0
+
+    def __load_keys(self, folder):
+        keys = []
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('.json'):
+                with open(os.path.join(folder, filename), 'r', encoding='utf8') as f:
+                    keys.extend(json.load(f).keys())
+        return keys
+
+    def __load_base_counts(self, project_root):
+        counts = dict(DEFAULT_BASE_COUNTS)
+        for name in FILE_FIELDS:
+            path = os.path.join(project_root, 'Source_Translated', f'{name}.json')
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf8') as f:
+                    counts[name] = len(json.load(f))
+        return counts
+
+    def count(self, name, scale) -> int:
+        return max(1, int(self.base_counts.get(name, 1000) * scale))
+
+    def random_text(self, min_length=4, max_length=24) -> str:
+        # The serial number keeps misses unique, like new game text would be
+        self.serial += 1
+        length = self.random.randint(min_length, max_length)
+        alphabet = KANA if self.random.random() < 0.5 else KATAKANA
+        return ''.join(self.random.choice(alphabet) for _ in range(length)) + str(self.serial)
+
+    def text(self) -> str:
+        if self.dictionary_keys and self.random.random() < self.hit_ratio:
+            return self.random.choice(self.dictionary_keys)
+        return self.random_text()
+
+    def effect_text(self) -> str:
+        parts = [self.random.choice(self.effect_keys) for _ in range(self.random.randint(1, 4))]
+        return '、'.join(parts)
+
+    def entries(self, name, scale) -> list:
+        entries = []
+        for entry_id in range(1, self.count(name, scale) + 1):
+            entry = {"id": entry_id, "sort": entry_id, "open_at": "", "close_at": ""}
+            for field in FILE_FIELDS[name]:
+                entry[field] = self.effect_text() if field == 'description_effect' else self.text()
+            entries.append(entry)
+        return entries
+
+    def characters(self, scale, leaderskill_count) -> list:
+        characters = self.entries('character', scale)
+        for char in characters:
+            for field in LEADER_SKILL_FIELDS:
+                char[field] = self.random.randint(1, leaderskill_count)
+        return characters
+
+    def charactercommands(self, command_count, character_count) -> list:
+        return [
+            {"id": command_id, "m_character_id": self.random.randint(1, character_count),
+             "m_command_id": command_id, "learn_type": 1, "lv": 1, "mana": 0}
+            for command_id in range(1, command_count + 1)
+        ]
+
+    def change_entries(self, entries, fields, ratio) -> list:
+        """Copy of entries where about `ratio` of them got new JP text in the given fields."""
+        changed = []
+        for entry in entries:
+            entry = entry.copy()
+            if self.random.random() < ratio:
+                for field in fields:
+                    if field in entry:
+                        entry[field] = self.random_text()
+            changed.append(entry)
+        return changed
+
+    def master_bundle(self, name, entries, path):
+        """Write a master bundle holding `entries` as the DataList of a MonoBehaviour named `name`, like the game's.
+
+        Unity can't be scripted here, so the texture of TEMPLATE_BUNDLE becomes the MonoBehaviour: it gets a
+        type tree built from the entries' fields (int or string) and the serialized DataList."""
+        import UnityPy
+        from UnityPy.enums import ClassIDType
+        from UnityPy.helpers.TypeTreeNode import TypeTreeNode
+
+        nodes = [_node(0, "MonoBehaviour", "Base")]
+        nodes += _pptr_nodes(1, "m_GameObject", "GameObject")
+        nodes.append(_node(1, "UInt8", "m_Enabled", 1, ALIGN_BYTES))
+        nodes += _pptr_nodes(1, "m_Script", "MonoScript")
+        nodes += _string_nodes(1, "m_Name")
+        nodes += [_node(1, "vector", "DataList"), _node(2, "Array", "Array", meta_flag=ALIGN_BYTES),
+                  _node(3, "int", "size", 4), _node(3, "Entry", "data")]
+        for field, value in entries[0].items():
+            nodes += [_node(4, "int", field, 4)] if isinstance(value, int) else _string_nodes(4, field)
+        for index, node in enumerate(nodes):
+            node["m_Index"] = index
+
+        env = UnityPy.load(os.path.join(self.project_root, TEMPLATE_BUNDLE))
+        bundle = next(iter(env.files.values()))
+        assets = next(file for file in bundle.files.values() if hasattr(file, "objects"))
+        texture = next(obj for obj in assets.objects.values() if obj.type.name == "Texture2D")
+        for obj in list(assets.objects.values()):
+            if obj.type.name == "Sprite":
+                del assets.objects[obj.path_id]
+
+        mono_type = copy.copy(texture.serialized_type)
+        mono_type.class_id = int(ClassIDType.MonoBehaviour)
+        mono_type.script_type_index = -1
+        mono_type.script_id = bytes(16)
+        mono_type.old_type_hash = bytes(16)
+        mono_type.type_dependencies = ()
+        mono_type.node = TypeTreeNode.from_list(nodes)
+        assets.types.append(mono_type)
+        texture.type_id = len(assets.types) - 1
+        texture.serialized_type = mono_type
+        texture.class_id = mono_type.class_id
+        texture.type = ClassIDType.MonoBehaviour
+        texture.save_typetree({"m_GameObject": {"m_FileID": 0, "m_PathID": 0}, "m_Enabled": 1,
+                               "m_Script": {"m_FileID": 0, "m_PathID": 0}, "m_Name": name, "DataList": entries})
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(bundle.save(packer="lz4"))
+
+def _node(level, type_name, name, byte_size=-1, meta_flag=0) -> dict:
+    return {"m_Level": level, "m_Type": type_name, "m_Name": name, "m_ByteSize": byte_size, "m_Version": 1,
+            "m_TypeFlags": 1 if type_name == "Array" else 0, "m_VariableCount": 0, "m_MetaFlag": meta_flag,
+            "m_RefTypeHash": 0}
+
+def _string_nodes(level, name) -> list:
+    return [_node(level, "string", name, meta_flag=0x8000), _node(level + 1, "Array", "Array", meta_flag=ALIGN_BYTES | 1),
+            _node(level + 2, "int", "size", 4, 1), _node(level + 2, "char", "data", 1, 1)]
+
+def _pptr_nodes(level, name, target) -> list:
+    return [_node(level, f"PPtr<{target}>", name, 12), _node(level + 1, "int", "m_FileID", 4),
+            _node(level + 1, "SInt64", "m_PathID", 8)]
+
+def write_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
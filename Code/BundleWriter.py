@@ -0,0 +1,31 @@
+import time
+
+from Code.FileHash import atomic_write
+from Code.config import Config
+
+# UnityPy packer of each Config.BUNDLE_COMPRESSION mode.
+# (data flags, block flags): 0x40 = directory info stored in the header, low bits = compression (2 = LZ4)
+PACKERS = {
+    "legacy": (64, 2),          # LZ4 blocks, uncompressed header: what the translator always wrote
+    "original": "original",     # the flags of the game's bundle (LZ4HC for the masters and atlases)
+    "lz4": "lz4",               # LZ4 blocks and header
+    "none": "none",             # no compression: largest files, fastest to save
+}
+
+def packer(compression:str = None):
+    """UnityPy packer of a compression mode (Config.BUNDLE_COMPRESSION when not given)."""
+    compression = compression or Config.BUNDLE_COMPRESSION
+    if compression not in PACKERS:
+        raise ValueError(f"Unknown bundle compression {compression!r}, expected one of: {', '.join(PACKERS)}")
+    return PACKERS[compression]
+
+def write_bundle(env_file, output_path:str, compression:str = None) -> dict:
+    """Save a loaded bundle to output_path. Returns {"compression", "save_seconds", "bytes"}."""
+    compression = compression or Config.BUNDLE_COMPRESSION
+    start_time = time.perf_counter()
+    data = env_file.save(packer=packer(compression))
+    save_seconds = time.perf_counter() - start_time
+
+    with atomic_write(output_path, "wb") as f:
+        f.write(data)
+    return {"compression": compression, "save_seconds": save_seconds, "bytes": len(data)}
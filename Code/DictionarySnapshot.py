@@ -0,0 +1,117 @@
+import json
+import marshal
+from pathlib import Path
+
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
+from Code.TemplateIndex import TemplateIndex, normalize
+from Code.config import Paths
+
+# Bumped whenever the layout of the snapshot or the way it is compiled changes
+VERSION = 1
+
+class DictionarySnapshot:
+    """The Dictionaries/*.json files merged and compiled into one marshal file, rebuilt only when one of them changes.
+
+    Files are merged in file name order and a later file overrides an earlier one (the order Windows
+    lists them in, which is what decided before). Besides the exact keys, every key is indexed by its
+    normalized form (NFKC, no whitespace) so a text that only differs by width or spacing still hits,
+    and the TemplateIndex is compiled once and stored. Entries that lose to another file, or to
+    another key with the same normalized form, are written to the shadow report."""
+
+    def __init__(self, dictionaries_dir=Paths.DICTIONARIES_DIR, snapshot_path=Paths.DICTIONARY_SNAPSHOT,
+                 shadows_path=Paths.DICTIONARY_SHADOWS):
+        self.dictionaries_dir = Path(dictionaries_dir)
+        self.snapshot_path = Path(snapshot_path)
+        self.shadows_path = Path(shadows_path)
+
+    def load(self) -> dict:
+        """{"dictionary", "normalized", "templates", "ambiguous"}, from the snapshot when it is current."""
+        sources = self.__sources()
+        snapshot = self.__read()
+        if snapshot is not None and self.__is_current(snapshot, sources):
+            return snapshot
+        return self.compile()
+
+    def __sources(self) -> dict:
+        if not self.dictionaries_dir.exists():
+            return {}
+        return {path.name: file_signature(path) for path in sorted(self.dictionaries_dir.glob('*.json'))}
+
+    def __read(self):
+        if not self.snapshot_path.exists():
+            return None
+        try:
+            with self.snapshot_path.open('rb') as f:
+                snapshot = marshal.load(f)
+        except (EOFError, ValueError, TypeError):
+            return None
+        return snapshot if isinstance(snapshot, dict) and snapshot.get("version") == VERSION else None
+
+    def __is_current(self, snapshot, sources) -> bool:
+        recorded = snapshot["sources"]
+        if recorded.keys() != sources.keys():
+            return False
+        touched = [name for name, signature in sources.items() if recorded[name]["signature"] != signature]
+        if not all(is_unchanged(self.dictionaries_dir / name, recorded[name]) for name in touched):
+            return False
+        if touched:
+            # Same content, only touched: keep the refreshed signatures so the files aren't hashed next time
+            self.__write(snapshot)
+        return True
+
+    def compile(self) -> dict:
+        """Merge and index the dictionaries, save the snapshot and the shadow report."""
+        sources = {}
+        dictionary = {}
+        owners = {}     # key -> file it comes from
+        shadows = []
+        for name in self.__sources():
+            path = self.dictionaries_dir / name
+            # Signature and hash are taken before parsing, so an edit made meanwhile is caught on the next load
+            sources[name] = {"signature": file_signature(path), "hash": file_digest(path)}
+            with path.open('r', encoding='utf8') as f:
+                try:
+                    entries = json.load(f)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping invalid JSON file {name}")
+                    continue
+            for jp_text, en_text in entries.items():
+                if jp_text in dictionary and dictionary[jp_text] != en_text:
+                    shadows.append({"key": jp_text, "translation": dictionary[jp_text], "file": owners[jp_text],
+                                    "shadowed_by": name, "reason": "overridden by a later file"})
+                dictionary[jp_text] = en_text
+                owners[jp_text] = name
+
+        # Exact keys are looked up first. Among keys with the same normalized form the one already
+        # written in normal form wins, otherwise the first one
+        normalized = {}
+        normalized_owners = {}
+        for jp_text, en_text in dictionary.items():
+            if not isinstance(jp_text, str):
+                continue
+            key = normalize(jp_text)
+            kept = normalized_owners.get(key)
+            if kept is not None:
+                loser, winner = (kept, jp_text) if jp_text == key else (jp_text, kept)
+                if normalized[key] != en_text:
+                    shadows.append({"key": loser, "translation": dictionary[loser], "file": owners[loser],
+                                    "shadowed_by": owners[winner], "reason": f"same normalized text as {winner!r}"})
+                if loser == jp_text:
+                    continue
+            normalized[key] = en_text
+            normalized_owners[key] = jp_text
+
+        templates = TemplateIndex(dictionary)
+        snapshot = {"version": VERSION, "sources": sources, "dictionary": dictionary, "normalized": normalized,
+                    "templates": templates.templates, "ambiguous": templates.ambiguous}
+        self.__write(snapshot)
+
+        with atomic_write(self.shadows_path) as f:
+            json.dump(shadows, f, ensure_ascii=False, indent=2)
+        print(f"       ├─ 📚 Compiled {len(dictionary)} dictionary entries from {len(sources)} file(s): "
+              f"{len(shadows)} shadowed (see {self.shadows_path}), {len(templates.ambiguous)} ambiguous templates")
+        return snapshot
+
+    def __write(self, snapshot):
+        with atomic_write(self.snapshot_path, 'wb') as f:
+            marshal.dump(snapshot, f)
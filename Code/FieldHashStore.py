@@ -0,0 +1,76 @@
+import hashlib
+import json
+import marshal
+from pathlib import Path
+
+from Code.FileHash import atomic_write
+from Code.config import Config, Paths
+
+# Bumped whenever the layout of the stores or the hashing changes
+VERSION = 1
+
+def field_hash(value) -> bytes:
+    """Short hash of a field's JP value."""
+    data = value.encode('utf8') if isinstance(value, str) else repr(value).encode('utf8')
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+class FieldHashStore:
+    """Hash of the JP text behind every translated field, per master: {id: {field: hash}}.
+
+    A master's store is written once its translations are saved, so the next run can tell which fields of
+    the already translated entries changed in the game data and re-translate only those. A master without
+    a store yet falls back to its previous extract in Source/ (kept for FILES_TO_CHECK_FOR_UPDATES); with
+    neither, the data of the run becomes the baseline."""
+
+    def __init__(self, store_dir=Paths.FIELD_HASHES_DIR, source_dir=Paths.SOURCE_DIR):
+        self.store_dir = Path(store_dir)
+        self.source_dir = Path(source_dir)
+        self.stores = {}
+
+    def diff(self, name, entries) -> dict:
+        """{id: [fields]} for the entries the baseline knows whose JP text changed. New entries are not included."""
+        baseline = self.__baseline(name)
+        if not baseline:
+            return {}
+        changes = {}
+        for entry in entries:
+            known = baseline.get(entry["id"])
+            if known is None:
+                continue
+            fields = [field for field in Config.FIELDS_TO_TRANSLATE
+                      if field in entry and known.get(field) != field_hash(entry[field])]
+            if fields:
+                changes[entry["id"]] = fields
+        return changes
+
+    def update(self, name, entries):
+        """Record the JP text the translated file of `name` now corresponds to."""
+        hashes = self.__hashes(entries)
+        with atomic_write(self.store_dir / f'{name}.bin', 'wb') as f:
+            marshal.dump({"version": VERSION, "hashes": hashes}, f)
+        self.stores[name] = hashes
+
+    def __hashes(self, entries) -> dict:
+        return {entry["id"]: {field: field_hash(entry[field]) for field in Config.FIELDS_TO_TRANSLATE if field in entry}
+                for entry in entries}
+
+    def __baseline(self, name):
+        if name in self.stores:
+            return self.stores[name]
+        hashes = None
+        store_path = self.store_dir / f'{name}.bin'
+        if store_path.exists():
+            try:
+                with store_path.open('rb') as f:
+                    store = marshal.load(f)
+                if store.get("version") == VERSION:
+                    hashes = store["hashes"]
+            except (EOFError, ValueError, TypeError, AttributeError):
+                print(f"            ├─ ⚠️ Couldn't read {store_path}. Falling back to the previous extract.")
+        if hashes is None:
+            source_path = self.source_dir / f'{name}.json'
+            if source_path.exists():
+                with source_path.open('r', encoding='utf8') as f:
+                    hashes = self.__hashes(json.load(f))
+        self.stores[name] = hashes
+        return hashes
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+import hashlib
+import os
+from pathlib import Path
+import threading
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_signature(path) -> list:
+    """Cheap [size, mtime_ns] fingerprint, good enough to tell a file was not touched."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def file_digest(path) -> str:
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_unchanged(path, recorded:dict) -> bool:
+    """True if the file still has the content recorded as {"signature": file_signature, "hash": file_digest}.
+
+    Size and mtime are the shortcut, the file is only hashed when its mtime moved but not its size.
+    A file that was only touched gets its new signature written into `recorded`, so it isn't hashed
+    again once the caller saves it."""
+    signature = file_signature(path)
+    if recorded["signature"] == signature:
+        return True
+    if signature[0] != recorded["signature"][0] or file_digest(path) != recorded["hash"]:
+        return False
+    recorded["signature"] = signature
+    return True
+
+@contextmanager
+def atomic_write(path, mode:str = 'w'):
+    """Open a temp file next to `path` and move it over `path` once the block completes.
+
+    Readers, and a run interrupted halfway, only ever see the old or the new content. The temp name
+    is unique: threads and worker processes may write the same file at the same time."""
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    temp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(temp_path, mode, encoding=None if 'b' in mode else 'utf8') as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
@@ -2,55 +2,166 @@ import json
 import os
 from pathlib import Path
 import shutil
-import tempfile
 
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
 from Code.config import Paths
 
+LEADER_SKILL_FIELDS = (
+    "m_leader_skill_id",
+    "additional_m_leader_skill_id",
+    "m_leader_skill_id_sub_1",
+    "additional_m_leader_skill_id_sub_1",
+    "m_leader_skill_id_sub_2",
+    "additional_m_leader_skill_id_sub_2",
+    "m_leader_skill_id_sub_3",
+    "additional_m_leader_skill_id_sub_3",
+)
+
 class Helper:
     def __init__(self):
-        character_file_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, 'character.json')
-        with open(character_file_path, 'r', encoding='utf8') as f:
-            self.character_data = json.load(f)
-        # Build lookup dict: id -> character data
-        self.char_lookup = {char['id']: char for char in self.character_data}
-
-        charactercommand_file_path = os.path.join(Paths.UPDATED_FILES_DIR, 'charactercommand.json')
-        with open(charactercommand_file_path, 'r', encoding='utf8') as f:
-            self.character_command_data = json.load(f)
-        # Build lookup dict: m_command_id -> m_character_id
-        self.character_command_lookup = {entry['m_command_id']: entry['m_character_id'] for entry in self.character_command_data}
+        self.character_file_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, 'character.json')
+        self.charactercommand_file_path = os.path.join(Paths.UPDATED_FILES_DIR, 'charactercommand.json')
+        self.index_path = Path(Paths.RELATION_INDEX)
+        self.index_dirty = False
+
+        # Reverse lookups, persisted so character.json and charactercommand.json are only parsed when they change
+        self.characters = {}                # character id -> {'id', 'name'}
+        self.leaderskill_characters = {}    # leader skill id -> character ids, in file order
+        self.command_character = {}         # m_command_id -> m_character_id
+        self.index_sources = {}             # file path -> {'signature', 'hash'} the index was built from
+        self.__load_index()
+        self.refresh_sources()
+
+    def refresh_sources(self):
+        """Re-index character.json and charactercommand.json if they changed since the index was built."""
+        if not self.__is_source_current(self.character_file_path):
+            self.__index_characters_file()
+        if not self.__is_source_current(self.charactercommand_file_path):
+            self.__index_charactercommand_file()
+        self.save_index()
+
+    def __load_index(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with self.index_path.open('r', encoding='utf8') as f:
+                index = json.load(f)
+        except json.JSONDecodeError:
+            print(f"            ├─ ⚠️ Couldn't decode {self.index_path}. Rebuilding it.")
+            return
+        # JSON object keys are strings, ids are ints
+        self.characters = {int(k): v for k, v in index["characters"].items()}
+        self.leaderskill_characters = {int(k): v for k, v in index["leaderskill_characters"].items()}
+        self.command_character = {int(k): v for k, v in index["command_character"].items()}
+        self.index_sources = index["sources"]
+
+    def __is_source_current(self, file_path) -> bool:
+        source = self.index_sources.get(file_path)
+        if source is None or not os.path.exists(file_path):
+            return False
+        signature = source["signature"]
+        if not is_unchanged(file_path, source):
+            return False
+        self.index_dirty |= source["signature"] != signature
+        return True
+
+    def __record_source(self, file_path):
+        self.index_sources[file_path] = {"signature": file_signature(file_path), "hash": file_digest(file_path)}
+        self.index_dirty = True
+
+    def __index_characters_file(self):
+        self.characters = {}
+        self.leaderskill_characters = {}
+        if os.path.exists(self.character_file_path):
+            with open(self.character_file_path, 'r', encoding='utf8') as f:
+                self.index_characters(json.load(f))
+            self.__record_source(self.character_file_path)
+
+    def __index_charactercommand_file(self):
+        self.command_character = {}
+        if os.path.exists(self.charactercommand_file_path):
+            with open(self.charactercommand_file_path, 'r', encoding='utf8') as f:
+                # Build lookup dict: m_command_id -> m_character_id
+                self.command_character = {entry['m_command_id']: entry['m_character_id'] for entry in json.load(f)}
+            self.__record_source(self.charactercommand_file_path)
+        self.index_dirty = True
+
+    def index_characters(self, characters):
+        """Add or refresh the given character entries in the index."""
+        for char in characters:
+            previous = self.characters.get(char['id'])
+            if previous is not None:
+                for char_ids in self.leaderskill_characters.values():
+                    if char['id'] in char_ids:
+                        char_ids.remove(char['id'])
+            self.characters[char['id']] = {'id': char['id'], 'name': char.get('name')}
+            for field in LEADER_SKILL_FIELDS:
+                leaderskill_id = char.get(field)
+                if leaderskill_id is None:
+                    continue
+                char_ids = self.leaderskill_characters.setdefault(leaderskill_id, [])
+                if char['id'] not in char_ids:
+                    char_ids.append(char['id'])
+        self.index_dirty = True
+
+    def character_file_updated(self, new_characters):
+        """Called after new entries were written to character.json, so the index doesn't have to re-parse it."""
+        if self.__is_source_current(self.character_file_path):
+            return
+        self.index_characters(new_characters)
+        self.__record_source(self.character_file_path)
+        self.save_index()
+
+    def save_index(self):
+        if not self.index_dirty:
+            return
+        index = {
+            "sources": self.index_sources,
+            "characters": self.characters,
+            "leaderskill_characters": self.leaderskill_characters,
+            "command_character": self.command_character,
+        }
+        with atomic_write(self.index_path) as f:
+            json.dump(index, f, ensure_ascii=False)
+        self.index_dirty = False
 
     def find_character_by_leaderskill_id(self, leaderskill_id:int):
-        for char in self.character_data:
-            if leaderskill_id in (
-                char.get("m_leader_skill_id"),
-                char.get("additional_m_leader_skill_id"),
-                char.get("m_leader_skill_id_sub_1"),
-                char.get("additional_m_leader_skill_id_sub_1"),
-                char.get("m_leader_skill_id_sub_2"),
-                char.get("additional_m_leader_skill_id_sub_2"),
-                char.get("m_leader_skill_id_sub_3"),
-                char.get("additional_m_leader_skill_id_sub_3")
-            ):
-                return char
-    
-        return None
+        char_ids = self.leaderskill_characters.get(leaderskill_id)
+        if not char_ids:
+            return None
+        return self.characters.get(char_ids[0])
     
     def find_character_by_command_id(self, command_id:int):
-        character_id = self.character_command_lookup.get(command_id)
+        character_id = self.command_character.get(command_id)
         if character_id is None:
             return None
-        return self.char_lookup.get(character_id)
+        return self.characters.get(character_id)
 
     def safe_save_json(self, data, final_path):
-        # Create a temporary file in the same directory
-        dir_name = os.path.dirname(final_path)
-        with tempfile.NamedTemporaryFile('w', encoding='utf8', delete=False, dir=dir_name, suffix='.tmp') as tmp:
-            json.dump(data, tmp, ensure_ascii=False, indent=2)
-            temp_path = tmp.name
-
-        # Replace the original file with the temp file
-        shutil.move(temp_path, final_path)
+        with atomic_write(final_path) as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def append_journal(self, entries, journal_path):
+        # One JSON entry per line, flushed to disk so a crash loses at most the entries being written
+        os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        with open(journal_path, 'a', encoding='utf8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_journal(self, journal_path):
+        entries = []
+        if not os.path.exists(journal_path):
+            return entries
+        with open(journal_path, 'r', encoding='utf8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write, the entry will be translated again
+                    break
+        return entries
 
     def back_up_file(self, filename):
         masters_path = Path(Paths.GAME_MASTERS)
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
+from Code.config import Paths
+
+class MasterIndex:
+    """Persistent index of master name -> (bundle file, path_id, type).
+
+    Each bundle entry stores the size/mtime and content hash it was built from. A bundle is only
+    opened again when its size or mtime changed and its content hash no longer matches."""
+
+    def __init__(self, masters_path=Paths.GAME_MASTERS, index_path=Paths.MASTER_INDEX):
+        self.masters_path = Path(masters_path)
+        self.index_path = Path(index_path)
+        self.bundles = {}
+        self.dirty = False
+        if self.index_path.exists():
+            try:
+                with self.index_path.open('r', encoding='utf8') as f:
+                    self.bundles = json.load(f)
+            except json.JSONDecodeError:
+                print(f"            ├─ ⚠️ Couldn't decode {self.index_path}. Rebuilding the index.")
+
+    def lookup(self, names) -> dict:
+        """Return {name: {"bundle", "path_id", "type"}} for every requested master found in the masters folder."""
+        found = {}
+        for name in names:
+            # Master bundles are named after the master they contain
+            bundle_path = self.masters_path / name
+            if not bundle_path.is_file():
+                continue
+            entry = self.__get_bundle_entry(bundle_path)
+            for obj in entry["objects"]:
+                if obj["name"] == name:
+                    found[name] = {"bundle": str(bundle_path), "path_id": obj["path_id"], "type": obj["type"]}
+                    break
+            else:
+                print(f"            ├─ ⚠️ {name} not found in bundle {bundle_path.name}")
+        self.save()
+        return found
+
+    def __get_bundle_entry(self, bundle_path:Path) -> dict:
+        entry = self.bundles.get(bundle_path.name)
+        if entry is not None:
+            # Touched but not changed (re-downloads, copies) only refreshes the signature
+            signature = entry["signature"]
+            if is_unchanged(bundle_path, entry):
+                self.dirty |= entry["signature"] != signature
+                return entry
+
+        entry = {"signature": file_signature(bundle_path), "hash": file_digest(bundle_path),
+                 "objects": self.__scan_bundle(bundle_path)}
+        self.bundles[bundle_path.name] = entry
+        self.dirty = True
+        return entry
+
+    def __scan_bundle(self, bundle_path:Path) -> list:
+        import UnityPy  # Imported on first scan only, see UnityHelper
+        objects = []
+        env = UnityPy.load(str(bundle_path))
+        for obj in env.objects:
+            if obj.type.name != "MonoBehaviour":
+                continue
+            if not obj.serialized_type.nodes:
+                continue
+            # peek_name avoids parsing the whole object on recent UnityPy versions
+            name = obj.peek_name() if hasattr(obj, "peek_name") else obj.read().m_Name
+            objects.append({"name": name, "path_id": obj.path_id, "type": obj.type.name})
+        return objects
+
+    def save(self):
+        if not self.dirty:
+            return
+        with atomic_write(self.index_path) as f:
+            json.dump(self.bundles, f, ensure_ascii=False)
+        self.dirty = False
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
+from Code.config import Paths
+
+class MastersManifest:
+    """Content hashes of the game master bundles as we last saw (or installed) them.
+
+    A bundle counts as changed only when its bytes differ from the manifest. Size and mtime are
+    just a shortcut: when both match, the file is not hashed again."""
+
+    def __init__(self, masters_path=Paths.GAME_MASTERS, manifest_path=Paths.MASTERS_MANIFEST):
+        self.masters_path = Path(masters_path)
+        self.manifest_path = Path(manifest_path)
+        self.entries = {}
+        if self.manifest_path.exists():
+            try:
+                with self.manifest_path.open('r', encoding='utf8') as f:
+                    self.entries = json.load(f)
+            except json.JSONDecodeError:
+                print(f"            ├─ ⚠️ Couldn't decode {self.manifest_path}. Falling back to modification dates.")
+
+    def has(self, name) -> bool:
+        return name in self.entries
+
+    def is_changed(self, name) -> bool:
+        """True if the bundle bytes differ from the manifest. Only call for names the manifest has."""
+        file_path = self.masters_path / name
+        if not file_path.is_file():
+            return False
+        return not is_unchanged(file_path, self.entries[name])
+
+    def digest(self, name) -> str:
+        """Content hash of a bundle, taken from the manifest while its size/mtime haven't moved."""
+        file_path = self.masters_path / name
+        entry = self.entries.get(name)
+        if entry is not None and entry["signature"] == file_signature(file_path):
+            return entry["hash"]
+        return file_digest(file_path)
+
+    def record(self, names, hashes:dict = None):
+        """Store the current size/mtime/hash of the given bundles and save the manifest.
+        hashes: {name: content hash} already known for some of them, so they aren't read again."""
+        hashes = hashes or {}
+        for name in names:
+            file_path = self.masters_path / name
+            if file_path.is_file():
+                self.entries[name] = {"signature": file_signature(file_path), "hash": hashes.get(name) or file_digest(file_path)}
+        self.save()
+
+    def save(self):
+        with atomic_write(self.manifest_path) as f:
+            json.dump(self.entries, f, indent=2)
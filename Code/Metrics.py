@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime
+import functools
+import json
+import os
+from pathlib import Path
+import platform
+import threading
+import time
+import tracemalloc
+
+class Span:
+    """One timed run of a stage. peak_memory is only known while tracemalloc is tracing."""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.peak_memory = None
+
+class RunMetrics:
+    """Spans, counters and peak memory of one execution, for the --profile run report.
+
+    Spans with the same name add up, so a stage that runs once per master reports its total time,
+    how many times it ran and the highest memory peak seen while it was running. Everything is
+    thread-safe: the streaming pipeline records from its stage threads."""
+
+    def __init__(self):
+        self.spans = {}       # name -> {"count", "seconds", "peak_memory"}
+        self.counters = {}
+        self.records = {}     # section -> list of per item records, e.g. one per saved bundle
+        self.profiles = {}    # stage -> cProfile.Profile, only with profiling enabled
+        self.profiling = False
+        self.peak_memory = None
+        self._open_spans = []
+        self._profiled = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self, profile_stages:bool = False):
+        """Trace memory for the rest of the run, and collect a cProfile per stage if asked."""
+        self.profiling = profile_stages
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.peak_memory = 0
+
+    @contextmanager
+    def span(self, name, profile:bool = False):
+        """Time a block under `name`. With profile=True it is also a cProfile stage (the outermost one
+        of the thread wins when stages nest)."""
+        span = Span(name)
+        profiler = self.__start_profile(name) if profile else None
+        with self._lock:
+            self.__update_peaks()
+            self._open_spans.append(span)
+        start_time = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - start_time
+            if profiler is not None:
+                profiler.disable()
+                self._local.profiling = False
+                with self._lock:
+                    self._profiled.discard(name)
+            with self._lock:
+                self.__update_peaks()
+                self._open_spans.remove(span)
+                self.__add_span(span)
+
+    def timed(self, name, profile:bool = False):
+        """Decorator form of span()."""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name, profile):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds:float):
+        """Add a span measured elsewhere, e.g. in a worker process."""
+        span = Span(name)
+        span.seconds = seconds
+        with self._lock:
+            self.__add_span(span)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def log(self, section, **values):
+        """Add one record (e.g. a saved bundle and its size) to a list section of the report."""
+        with self._lock:
+            self.records.setdefault(section, []).append(values)
+
+    def __add_span(self, span):
+        totals = self.spans.setdefault(span.name, {"count": 0, "seconds": 0.0, "peak_memory": None})
+        totals["count"] += 1
+        totals["seconds"] += span.seconds
+        if span.peak_memory is not None:
+            totals["peak_memory"] = max(totals["peak_memory"] or 0, span.peak_memory)
+
+    def __update_peaks(self):
+        # tracemalloc has a single peak: hand it to every open span, then start a new interval
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in self._open_spans:
+            span.peak_memory = max(span.peak_memory or 0, peak)
+        if self.peak_memory is not None:
+            self.peak_memory = max(self.peak_memory, peak)
+        tracemalloc.reset_peak()
+
+    def __start_profile(self, name):
+        # A thread runs one profiler at a time, and a stage's profiler runs in one thread at a time
+        if not self.profiling or getattr(self._local, "profiling", False):
+            return None
+        with self._lock:
+            if name in self._profiled:
+                return None
+            self._profiled.add(name)
+            profiler = self.profiles.setdefault(name, cProfile.Profile())
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (or debugger) is active
+            with self._lock:
+                self._profiled.discard(name)
+            return None
+        self._local.profiling = True
+        return profiler
+
+    def report(self, **sections) -> dict:
+        """The run report as a dict. Extra sections (e.g. the per engine counters) are added as given."""
+        with self._lock:
+            self.__update_peaks()
+            return {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "peak_memory": self.peak_memory,
+                "spans": {name: {**totals, "seconds": round(totals["seconds"], 6)} for name, totals in self.spans.items()},
+                "counters": dict(self.counters),
+                **{section: list(records) for section, records in self.records.items()},
+                **sections,
+            }
+
+    def save(self, directory, **sections) -> Path:
+        """Write the run report (and the cProfile dumps, if any) under directory. Returns the report path."""
+        directory = Path(directory)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = directory / f"run_{stamp}.json"
+        with report_path.open('w', encoding='utf8') as f:
+            json.dump(self.report(**sections), f, indent=2)
+        for stage, profiler in self.profiles.items():
+            profiler.dump_stats(str(directory / f"run_{stamp}_{stage}.prof"))
+        return report_path
+
+# Shared by every stage of the run
+metrics = RunMetrics()
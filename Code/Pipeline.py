@@ -0,0 +1,161 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Iterable, List
+
+from Code.UnityHelper import generate_bundle
+from Code.config import Config
+
+# Marks the end of a stage's input
+_DONE = None
+
+class StreamingPipeline:
+    """Updates changed masters with overlapping stages: extract -> translate -> generate -> install.
+
+    While one master is being translated the previous one is regenerated (in the process pool) and
+    installed, and the next one is extracted unless it was handed over already extracted. Stages are connected by bounded queues so a
+    fast stage can't run far ahead of a slow one. A master that fails in one stage is reported and
+    skipped by the following ones; it isn't recorded in the manifest, so the next run picks it up again."""
+
+    def __init__(self, unity_helper, translator_helper, queue_size:int = None, workers:int = None):
+        self.unity_helper = unity_helper
+        self.translator_helper = translator_helper
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self.workers = workers or Config.GENERATION_WORKERS
+        self.failed = {}                                      # name -> stage it failed in
+        self.busy = {"extract": 0.0, "translate": 0.0, "generate": 0.0, "install": 0.0}
+        self.installed = []
+
+    def run(self, updated_files:Iterable[str], extracted:dict = None) -> List[str]:
+        """Run the pipeline over the updated masters. Returns the names of the installed files.
+        extracted: {name: entries} already extracted (find_updated_files), the extract stage only hands them over."""
+        print("\n    ℹ️ Updating files (streaming pipeline)")
+        start_time = time.time()
+        updated_files = set(updated_files)
+        extracted = extracted if extracted is not None else {}
+
+        # charactercommand only feeds the character lookups of the translation stage, extract it up front
+        if 'charactercommand' in updated_files:
+            if 'charactercommand' not in extracted:
+                self.unity_helper.datamine_files(['charactercommand'])
+            self.translator_helper.helper.refresh_sources()
+
+        # FILES_TO_TRANSLATE order keeps character ahead of the files that look character names up
+        locations = self.unity_helper.index.lookup(name for name in Config.FILES_TO_TRANSLATE if name in updated_files)
+        names = [name for name in Config.FILES_TO_TRANSLATE if name in locations]
+
+        to_translate = queue.Queue(maxsize=self.queue_size)
+        translated = queue.Queue(maxsize=self.queue_size)
+        generated = queue.Queue()
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 and len(names) > 1 else None
+        threads = [
+            threading.Thread(target=self.__extract, args=(names, extracted, to_translate)),
+            threading.Thread(target=self.__translate, args=(to_translate, translated)),
+            threading.Thread(target=self.__generate, args=(translated, generated, locations, executor)),
+            threading.Thread(target=self.__install, args=(generated, len(names))),
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # Whatever is left in Updated_Files (charactercommand) moves to Source like in the sequential update
+        self.translator_helper.move_extracts_to_source()
+        self.translator_helper.manifest.record(updated_files - set(Config.FILES_TO_TRANSLATE))
+
+        if self.failed:
+            print(f"       ├─ ❌ Failed to update {len(self.failed)} file(s): "
+                  f"{', '.join(f'{name} ({stage})' for name, stage in self.failed.items())}")
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.busy.items())
+        elapsed = time.time() - start_time
+        print(f"       ├─ ✅ Finished updating {len(self.installed)} file(s) in {elapsed:.2f}s (busy time: {stages}).")
+        return self.installed
+
+    def __fail(self, name, stage, error):
+        self.failed[name] = stage
+        print(f"            ├─ ❌ Failed to {stage} {name}: {error}")
+
+    def __extract(self, names, extracted, outbox):
+        try:
+            for name in names:
+                start_time = time.time()
+                try:
+                    entries = extracted.pop(name) if name in extracted else self.unity_helper.datamine_files([name]).get(name)
+                except Exception as e:
+                    self.__fail(name, "extract", e)
+                    continue
+                finally:
+                    self.busy["extract"] += time.time() - start_time
+                # The entries travel with the name: translation doesn't parse the exported file again
+                outbox.put((name, entries))
+        finally:
+            outbox.put(_DONE)
+
+    def __translate(self, inbox, outbox):
+        try:
+            while (item := inbox.get()) is not _DONE:
+                name, entries = item
+                start_time = time.time()
+                try:
+                    self.translator_helper.translate_updated_file(f"{name}.json", entries)
+                except Exception as e:
+                    self.__fail(name, "translate", e)
+                    continue
+                finally:
+                    self.busy["translate"] += time.time() - start_time
+                outbox.put(name)
+        finally:
+            outbox.put(_DONE)
+
+    def __generate(self, inbox, outbox, locations, executor):
+        compression = Config.BUNDLE_COMPRESSION
+        try:
+            while (name := inbox.get()) is not _DONE:
+                if executor is not None:
+                    outbox.put((name, executor.submit(generate_bundle, name, locations[name], compression)))
+                    continue
+                # No pool: generate here and hand over an already resolved future
+                future = Future()
+                try:
+                    future.set_result(generate_bundle(name, locations[name], compression))
+                except Exception as e:
+                    future.set_exception(e)
+                outbox.put((name, future))
+        finally:
+            outbox.put(_DONE)
+
+    def __install(self, inbox, total):
+        done = 0
+        failed = []
+        while (item := inbox.get()) is not _DONE:
+            name, future = item
+            done += 1
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+            self.unity_helper._report_generated_bundle(done, total, name, result, error, failed)
+            if error is not None:
+                self.failed[name] = "generate"
+                continue
+            self.busy["generate"] += result["elapsed"]
+
+            start_time = time.time()
+            try:
+                install_manifest = {Path(output).name: self.translator_helper.install_game_file(Path(output))
+                                    for output in result["outputs"]}
+                # Our own copies must not be seen as game updates next time. A skipped bundle is already
+                # what we would install
+                self.translator_helper.manifest.record(list(install_manifest) or [name],
+                                                       {file: entry["hash"] for file, entry in install_manifest.items()})
+                self.installed.extend(file for file, entry in install_manifest.items() if entry["installed"])
+            except Exception as e:
+                self.__fail(name, "install", e)
+            finally:
+                self.busy["install"] += time.time() - start_time
@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+
+from Code.Metrics import metrics
+from Code.config import Config
+
+# How a failed request is handled
+RATE_LIMITED = "rate_limited"   # back off (honouring Retry-After) and slow the engine down
+TRANSIENT = "transient"         # back off and retry
+FATAL = "fatal"                 # out of quota / bad key: stop using the engine for this run
+
+class EngineUnavailable(Exception):
+    """Raised when neither the engine nor its fallbacks could translate a batch."""
+
+class TokenBucket:
+    """Thread-safe token bucket. The rate adapts: halved on rate limiting, raised back on success."""
+
+    def __init__(self, rate:float, capacity:float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens:float = 1) -> float:
+        """Take tokens, sleeping until they are available. Returns the time spent waiting.
+        More tokens than the capacity go into debt: the next callers wait for it to be paid back."""
+        waited = 0.0
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.max_rate * Config.ENGINE_MIN_RATE_RATIO, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one trial request through after `cooldown` seconds.
+    trip() opens it for the rest of the run."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    DISABLED = "disabled"
+
+    def __init__(self, threshold:int, cooldown:float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reason = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.DISABLED:
+                self.state = self.CLOSED
+                self.failures = 0
+
+    def record_failure(self, reason):
+        with self._lock:
+            if self.state == self.DISABLED:
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.reason = reason
+
+    def trip(self, reason):
+        with self._lock:
+            self.state = self.DISABLED
+            self.reason = reason
+
+def retry_after(error):
+    """Seconds asked by the server (Retry-After), if the error carries them."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+class RequestScheduler:
+    """Shared gate in front of the external translation engines.
+
+    Every batch goes through the engine's token bucket and is retried with exponential backoff and
+    jitter. Each engine has a circuit breaker: while it is open (engine degraded), or once the engine
+    is out of quota or rejects the key, batches go to the fallback engine instead."""
+
+    def __init__(self, engines:dict, classify, fallbacks:dict = None, costs:dict = None):
+        """engines: name -> callable(texts) returning the translations in order.
+        classify: callable(engine, error) -> RATE_LIMITED, TRANSIENT or FATAL.
+        fallbacks: name -> engines to try when it is unavailable.
+        costs: name -> callable(texts) returning how many HTTP requests a batch takes (1 when not given)."""
+        self.engines = engines
+        self.classify = classify
+        self.fallbacks = fallbacks or {}
+        self.costs = costs or {}
+        self.buckets = {}
+        self.breakers = {}
+        self.metrics = {}
+        for name in engines:
+            self.buckets[name] = TokenBucket(Config.ENGINE_RATE_LIMITS.get(name, 1.0), Config.TRANSLATION_WORKERS)
+            self.breakers[name] = CircuitBreaker(Config.CIRCUIT_BREAKER_THRESHOLD, Config.CIRCUIT_BREAKER_COOLDOWN)
+            self.metrics[name] = {"requests": 0, "texts": 0, "characters": 0, "retries": 0, "rate_limited": 0,
+                                  "failures": 0, "fallbacks": 0, "throttled_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def disable(self, engine, reason):
+        """Stop sending requests to an engine for the rest of the run."""
+        self.breakers[engine].trip(reason)
+
+    def translate(self, engine, texts) -> tuple:
+        """Translate a batch with the engine or, if it is unavailable, its fallbacks.
+        Returns (engine used, translations)."""
+        for candidate in [engine] + self.fallbacks.get(engine, []):
+            if candidate not in self.engines:
+                continue
+            translations = self.__try_engine(candidate, texts)
+            if translations is not None:
+                return candidate, translations
+            self.__count(candidate, fallbacks=1)
+        raise EngineUnavailable(f"No translation engine available for {len(texts)} texts "
+                                f"({', '.join(f'{name}: {self.breakers[name].reason}' for name in self.engines)})")
+
+    def __try_engine(self, engine, texts):
+        breaker = self.breakers[engine]
+        bucket = self.buckets[engine]
+        cost = self.costs[engine](texts) if engine in self.costs else 1
+        for attempt in range(Config.ENGINE_MAX_RETRIES):
+            if not breaker.allow():
+                return None
+            self.__count(engine, throttled_seconds=bucket.acquire(cost), requests=cost, retries=1 if attempt else 0)
+            try:
+                translations = self.engines[engine](texts)
+            except Exception as e:
+                kind = self.classify(engine, e)
+                self.__count(engine, failures=1, rate_limited=1 if kind == RATE_LIMITED else 0)
+                if kind == FATAL:
+                    print(f"            ├─ ❌ {engine} disabled for this run: {e}")
+                    breaker.trip(str(e))
+                    return None
+                breaker.record_failure(str(e))
+                if breaker.state == CircuitBreaker.OPEN:
+                    print(f"            ├─ ⚠️ {engine} degraded, sending its batches to the fallback engine: {e}")
+                    return None
+                if kind == RATE_LIMITED:
+                    bucket.slow_down()
+                if attempt < Config.ENGINE_MAX_RETRIES - 1:
+                    delay = self.__backoff(attempt, retry_after(e))
+                    print(f"            ├─ ⚠️ {engine} attempt {attempt + 1}/{Config.ENGINE_MAX_RETRIES} failed: {e}. Retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                continue
+            breaker.record_success()
+            bucket.speed_up()
+            self.__count(engine, texts=len(texts), characters=sum(len(text) for text in texts))
+            return translations
+        return None
+
+    def __backoff(self, attempt, server_delay):
+        # Full jitter keeps the worker threads from retrying in lockstep
+        delay = random.uniform(0, min(Config.ENGINE_BACKOFF_MAX, Config.ENGINE_BACKOFF_BASE * 2 ** attempt))
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        return delay
+
+    def __count(self, engine, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self.metrics[engine][name] += value
+                # Per engine counters of the run report
+                if value:
+                    metrics.count(f"{engine} {name}", value)
+
+    def report(self):
+        for engine, engine_metrics in self.metrics.items():
+            breaker = self.breakers[engine]
+            if not engine_metrics["requests"]:
+                continue
+            print(f"       ├─ 🌐 {engine}: {engine_metrics['requests']} requests, {engine_metrics['texts']} texts, "
+                  f"{engine_metrics['characters']} characters, {engine_metrics['retries']} retries, "
+                  f"{engine_metrics['rate_limited']} rate limited, {engine_metrics['fallbacks']} batches sent to fallback, "
+                  f"{engine_metrics['throttled_seconds']:.1f}s throttled, "
+                  f"rate {self.buckets[engine].rate:.2f}/s, circuit {breaker.state}")
@@ -0,0 +1,94 @@
+import re
+import unicodedata
+
+# Numbers and game placeholders such as #PER# are the variable parts of a text
+SLOT_PATTERN = re.compile(r'#[A-Z_]+#|\d+(?:\.\d+)?')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Stands for a slot in a canonical key
+SLOT = '\x00'
+
+def normalize(text:str):
+    """Text with full-width forms folded (NFKC: '１０％' -> '10%') and whitespace dropped."""
+    return WHITESPACE_PATTERN.sub('', unicodedata.normalize('NFKC', text))
+
+def canonical(text:str):
+    """Canonical key of a text plus its slot values, in order.
+
+    The text is normalized and every number or placeholder is replaced by a slot, so '攻撃力+１０ ％'
+    and '攻撃力+#PER#%' share one key."""
+    text = normalize(text)
+    values = SLOT_PATTERN.findall(text)
+    return SLOT_PATTERN.sub(SLOT, text), values
+
+class TemplateIndex:
+    """Dictionary lookups that tolerate different numbers, placeholders, widths and spacing.
+
+    Each dictionary entry is compiled into a canonical key and a translation template: the slots of
+    the JP key are matched, in order, with the same numbers/placeholders in the English text. A
+    lookup canonicalizes the text, finds the template and writes the text's own values back in.
+
+    An entry becomes a template only if every slot of its key shows up in the translation, otherwise
+    a different value couldn't be carried over. When entries share a key but disagree on the
+    template, the template most of them agree on wins. On a tie, entries written with placeholders
+    (#PER#) keep the first template, while numbered entries ('1枚目' -> '1st', '2枚目' -> '2nd') are
+    left to exact lookups."""
+
+    def __init__(self, dictionary:dict):
+        candidates = {}     # key -> {template: entry count}, in dictionary order
+        numbered = set()    # keys with at least one entry written with literal numbers
+        for jp_text, en_text in dictionary.items():
+            if not isinstance(jp_text, str) or not isinstance(en_text, str):
+                continue
+            key, values = canonical(jp_text)
+            template = self.__compile(values, en_text)
+            if template is None:
+                continue
+            counts = candidates.setdefault(key, {})
+            counts[template] = counts.get(template, 0) + 1
+            if any(not value.startswith('#') for value in values):
+                numbered.add(key)
+
+        self.templates = {}
+        self.ambiguous = set()
+        for key, counts in candidates.items():
+            ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+            if len(ranked) > 1 and ranked[0][1] == ranked[1][1] and key in numbered:
+                self.ambiguous.add(key)
+                continue
+            self.templates[key] = ranked[0][0]
+
+    @classmethod
+    def restore(cls, templates:dict, ambiguous:set):
+        """Index made from the templates and ambiguous keys of an index compiled earlier."""
+        index = cls.__new__(cls)
+        index.templates = templates
+        index.ambiguous = ambiguous
+        return index
+
+    def __compile(self, values, en_text):
+        # Template: tuple of literal strings and slot numbers (ints), e.g. ('ATK +', 0, '%')
+        parts = []
+        used = set()
+        position = 0
+        for match in SLOT_PATTERN.finditer(en_text):
+            slot = next((i for i, value in enumerate(values) if i not in used and value == match.group()), None)
+            if slot is None:
+                continue  # A number that belongs to the translation itself
+            used.add(slot)
+            parts.extend((en_text[position:match.start()], slot))
+            position = match.end()
+        if len(used) != len(values):
+            return None
+        parts.append(en_text[position:])
+        return tuple(part for part in parts if part != '')
+
+    def translate(self, jp_text):
+        """Translation of jp_text from a matching template, or None."""
+        key, values = canonical(jp_text)
+        template = self.templates.get(key)
+        if template is None:
+            return None
+        return ''.join(values[part] if isinstance(part, int) else part for part in template)
+
+    def __len__(self):
+        return len(self.templates)
@@ -0,0 +1,168 @@
+from pathlib import Path
+import time
+
+from Code.BundleWriter import write_bundle
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
+from Code.config import Paths
+
+# UnityPy, NumPy and Pillow are imported by the functions that need them: this module is loaded by
+# UnityHelper, which must stay cheap to import
+
+class AtlasCache:
+    """Decoded EN atlases (RGBA pixels plus sprite rects) of the Global_Assets bundles, kept between runs.
+
+    Entries are .npz files keyed by the bundle's relative path and invalidated like the other caches:
+    by size/mtime first, content hash second."""
+
+    def __init__(self, cache_dir=Paths.ATLAS_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def load(self, asset_file:Path, relative_path:Path):
+        """Returns (pixels, {sprite name: (x, y, width, height)}, cache hit)."""
+        import numpy as np
+
+        cache_path = self.cache_dir / relative_path.with_name(relative_path.name + '.npz')
+        if cache_path.exists():
+            with np.load(cache_path, allow_pickle=False) as cached:
+                recorded = {"signature": [int(value) for value in cached["signature"]], "hash": str(cached["hash"])}
+                if is_unchanged(asset_file, recorded):
+                    rects = {str(name): tuple(rect) for name, rect in zip(cached["names"], cached["rects"])}
+                    return cached["pixels"], rects, True
+
+        import UnityPy
+        env = UnityPy.load(str(asset_file))
+        texture = next((obj.read() for obj in env.objects if obj.type.name == "Texture2D"), None)
+        if texture is None:
+            raise ValueError(f"No texture found in {asset_file}")
+        pixels = np.asarray(texture.image.convert("RGBA"))
+        rects = {}
+        for obj in env.objects:
+            if obj.type.name == "Sprite":
+                sprite = obj.read()
+                rect = sprite.m_RD.textureRect
+                rects[sprite.m_Name] = (rect.x, rect.y, rect.width, rect.height)
+
+        with atomic_write(cache_path, 'wb') as f:
+            np.savez(f, pixels=pixels, names=np.array(list(rects), dtype=str),
+                     rects=np.array(list(rects.values()), dtype=np.float64).reshape(-1, 4),
+                     signature=np.array(file_signature(asset_file), dtype=np.int64), hash=np.array(file_digest(asset_file)))
+        return pixels, rects, False
+
+def _box(rect, image_height):
+    # Pillow crop box of a sprite rect. Sprite rects start at the bottom of the texture, images at the top
+    x, y, width, height = rect
+    return int(x), image_height - int(y + height), int(x + width), image_height - int(y)
+
+def _crop(pixels, box):
+    # Like Image.crop: the parts of the box outside the image come out transparent
+    import numpy as np
+    left, top, right, bottom = box
+    crop = np.zeros((max(bottom - top, 0), max(right - left, 0), 4), dtype=pixels.dtype)
+    src_top, src_left = max(top, 0), max(left, 0)
+    src_bottom, src_right = min(bottom, pixels.shape[0]), min(right, pixels.shape[1])
+    if src_bottom > src_top and src_right > src_left:
+        crop[src_top - top:src_bottom - top, src_left - left:src_right - left] = pixels[src_top:src_bottom, src_left:src_right]
+    return crop
+
+def _paste(pixels, patch, left, top):
+    # Like Image.paste without a mask: the patch replaces the pixels, clipped to the image
+    dst_top, dst_left = max(top, 0), max(left, 0)
+    dst_bottom = min(top + patch.shape[0], pixels.shape[0])
+    dst_right = min(left + patch.shape[1], pixels.shape[1])
+    if dst_bottom > dst_top and dst_right > dst_left:
+        pixels[dst_top:dst_bottom, dst_left:dst_right] = patch[dst_top - top:dst_bottom - top, dst_left - left:dst_right - left]
+
+def _blit_batch(jp_pixels, en_pixels, batch):
+    # batch: (src top, src left, dst top, dst left, height, width) of same-size, in-bounds sprites
+    import numpy as np
+    src_top, src_left, dst_top, dst_left, heights, widths = (np.array(column) for column in zip(*batch))
+    areas = heights * widths
+    # One entry per copied pixel: which sprite it belongs to and its offset inside the sprite
+    sprite = np.repeat(np.arange(len(batch)), areas)
+    offset = np.arange(areas.sum()) - np.repeat(np.cumsum(areas) - areas, areas)
+    dy, dx = np.divmod(offset, widths[sprite])
+    jp_pixels[dst_top[sprite] + dy, dst_left[sprite] + dx] = en_pixels[src_top[sprite] + dy, src_left[sprite] + dx]
+
+def blit_sprites(jp_pixels, en_pixels, pairs):
+    """Copy EN sprites over the JP atlas. pairs: list of (EN rect, JP rect).
+
+    Sprites of the same size that sit fully inside both atlases are copied together with one
+    fancy-indexing assignment. The others (resized, or partly outside an atlas) go one at a time
+    and follow Pillow's crop/resize/paste rules; the pending batch is flushed before each of them so
+    overlapping sprites end up in the same order as before. Returns how many were resized."""
+    import numpy as np
+    from PIL import Image
+
+    batch = []
+    resized = 0
+    for rect_en, rect_jp in pairs:
+        src = _box(rect_en, en_pixels.shape[0])
+        left, top, _, _ = _box(rect_jp, jp_pixels.shape[0])
+        size_en = (int(rect_en[2]), int(rect_en[3]))
+        size_jp = (int(rect_jp[2]), int(rect_jp[3]))
+        height, width = src[3] - src[1], src[2] - src[0]
+        if (size_en == size_jp and src[0] >= 0 and src[1] >= 0 and src[2] <= en_pixels.shape[1] and src[3] <= en_pixels.shape[0]
+                and left >= 0 and top >= 0 and left + width <= jp_pixels.shape[1] and top + height <= jp_pixels.shape[0]):
+            if height > 0 and width > 0:
+                batch.append((src[1], src[0], top, left, height, width))
+            continue
+
+        if batch:
+            _blit_batch(jp_pixels, en_pixels, batch)
+            batch = []
+        if size_en != size_jp:
+            # Resize crop to match JP size, as Pillow does it
+            crop = Image.fromarray(_crop(en_pixels, src), "RGBA").resize(size_jp)
+            _paste(jp_pixels, np.asarray(crop), left, top)
+            resized += 1
+        else:
+            _paste(jp_pixels, _crop(en_pixels, src), left, top)
+
+    if batch:
+        _blit_batch(jp_pixels, en_pixels, batch)
+    return resized
+
+# Module level so it can run in a worker process
+def patch_texture_asset(asset_file:str, game_asset_file:str, relative_path:str, compression:str = None) -> dict:
+    """Blit the EN sprites of a Global_Assets bundle over the matching game bundle and save it to Patched_Textures."""
+    import numpy as np
+    from PIL import Image
+    import UnityPy
+
+    start_time = time.time()
+    asset_file, game_asset_file, relative_path = Path(asset_file), Path(game_asset_file), Path(relative_path)
+    en_pixels, en_rects, cached = AtlasCache().load(asset_file, relative_path)
+
+    with game_asset_file.open("rb") as f:
+        target_env = UnityPy.load(f)
+    jp_texture = next((obj.read() for obj in target_env.objects if obj.type.name == "Texture2D"), None)
+    if jp_texture is None:
+        raise ValueError(f"No texture found in {game_asset_file}")
+
+    pairs = []
+    skipped = []
+    for obj in target_env.objects:
+        if obj.type.name != "Sprite":
+            continue
+        jp_sprite = obj.read()
+        rect_en = en_rects.get(jp_sprite.m_Name)
+        if rect_en is None:
+            skipped.append(jp_sprite.m_Name)
+            continue
+        rect = jp_sprite.m_RD.textureRect
+        pairs.append((rect_en, (rect.x, rect.y, rect.width, rect.height)))
+
+    jp_pixels = np.array(jp_texture.image.convert("RGBA"))
+    resized = blit_sprites(jp_pixels, en_pixels, pairs)
+
+    # Final save
+    jp_texture.image = Image.fromarray(jp_pixels, "RGBA")
+    jp_texture.save()
+
+    # Save the whole environment (updated bundle)
+    save_path = Path(Paths.PATCHED_TEXTURES) / relative_path
+    for path, env_file in target_env.files.items():
+        saved = write_bundle(env_file, str(save_path), compression)
+
+    return {"patched": len(pairs), "resized": resized, "skipped": skipped, "cached_atlas": cached,
+            "output": str(save_path), **saved, "elapsed": time.time() - start_time}
@@ -0,0 +1,127 @@
+import json
+import marshal
+import mmap
+from pathlib import Path
+import struct
+
+from Code.FileHash import atomic_write, file_digest, file_signature, is_unchanged
+from Code.config import Config, Paths
+
+# magic, format version, JSON size, JSON mtime_ns, JSON blake2b digest, length of the column table
+HEADER = struct.Struct('<6sBQQ16sI')
+MAGIC = b'DRPGTC'
+VERSION = 2
+# Stands for a field the entry doesn't have (None is a valid value)
+MISSING = ...
+# Table key of the text overlay blob
+OVERLAY = '__overlay__'
+
+class TranslatedCache:
+    """Compiled, read-only copies of the Source_Translated JSON files.
+
+    Each file is stored column by column: `id` plus one marshal blob per FIELDS_TO_TRANSLATE field
+    the file uses.
+    A text overlay (the (id, field, text) triples used to patch bundles) is stored next to them.
+    Reads memory-map the file and only unmarshal the requested columns. The JSON files stay the
+    source of truth: a compiled file is rebuilt whenever its JSON no longer matches the size/mtime
+    (or, if those moved, the content hash) recorded in its header."""
+
+    COLUMNS = ['id'] + Config.FIELDS_TO_TRANSLATE
+
+    def __init__(self, source_dir=Paths.SOURCE_TRANSLATED_DIR, cache_dir=Paths.COMPILED_SOURCE_DIR):
+        self.source_dir = Path(source_dir)
+        self.cache_dir = Path(cache_dir)
+
+    def ids(self, name) -> list:
+        """Ids of the translated entries of a master, in file order."""
+        return self.__read(name, ['id'])['id']
+
+    def load(self, name, fields=None) -> dict:
+        """{id: {field: value}} for the given fields (default: all FIELDS_TO_TRANSLATE).
+        Fields an entry doesn't have are left out of its dict."""
+        fields = [field for field in (fields or Config.FIELDS_TO_TRANSLATE) if field in self.COLUMNS]
+        columns = self.__read(name, ['id'] + fields)
+        fields = [field for field in fields if field in columns]
+        translated = {entry_id: {} for entry_id in columns['id']}
+        for field in fields:
+            for entries, value in zip(translated.values(), columns[field]):
+                if value is not MISSING:
+                    entries[field] = value
+        return translated
+
+    def overlay(self, name) -> dict:
+        """{id: ((field, text), ...)} with only the string values of the translated fields, for bundle patching."""
+        overlay = {}
+        for entry_id, field, text in self.__read(name, [OVERLAY]).get(OVERLAY, []):
+            overlay.setdefault(entry_id, []).append((field, text))
+        return overlay
+
+    def __read(self, name, columns) -> dict:
+        json_path = self.source_dir / f'{name}.json'
+        if not json_path.exists():
+            return {column: [] for column in columns}
+
+        cache_path = self.cache_dir / f'{name}.bin'
+        if not self.__is_current(cache_path, json_path):
+            self.compile(name)
+
+        with cache_path.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            table_length = HEADER.unpack_from(data)[-1]
+            table = marshal.loads(data[HEADER.size:HEADER.size + table_length])
+            start = HEADER.size + table_length
+            # Columns no entry has a value for are not stored
+            return {column: marshal.loads(data[start + offset:start + offset + length])
+                    for column in columns if column in table for offset, length in [table[column]]}
+
+    def __is_current(self, cache_path, json_path) -> bool:
+        if not cache_path.exists():
+            return False
+        with cache_path.open('rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, size, mtime_ns, digest, table_length = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            return False
+        recorded = {"signature": [size, mtime_ns], "hash": digest.hex()}
+        if not is_unchanged(json_path, recorded):
+            return False
+        if recorded["signature"] != [size, mtime_ns]:
+            # Same content, only touched: refresh the signature in place so the file isn't hashed next time
+            with cache_path.open('r+b') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, *recorded["signature"], digest, table_length))
+        return True
+
+    def compile(self, name):
+        """Build the compiled copy of Source_Translated/<name>.json."""
+        json_path = self.source_dir / f'{name}.json'
+        # Signature and hash are taken before parsing, so an edit made meanwhile is caught on the next read
+        signature = file_signature(json_path)
+        digest = bytes.fromhex(file_digest(json_path))
+        with json_path.open('r', encoding='utf8') as f:
+            entries = json.load(f)
+
+        blobs = []
+        table = {}
+        offset = 0
+        for column in self.COLUMNS:
+            values = [entry.get(column, MISSING) for entry in entries]
+            if column != 'id' and all(value is MISSING for value in values):
+                continue
+            blob = marshal.dumps(values)
+            table[column] = (offset, len(blob))
+            offset += len(blob)
+            blobs.append(blob)
+        overlay = [(entry['id'], field, entry[field]) for entry in entries
+                   for field in Config.FIELDS_TO_TRANSLATE if isinstance(entry.get(field), str)]
+        blob = marshal.dumps(overlay)
+        table[OVERLAY] = (offset, len(blob))
+        blobs.append(blob)
+        table_blob = marshal.dumps(table)
+
+        cache_path = self.cache_dir / f'{name}.bin'
+        with atomic_write(cache_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, *signature, digest, len(table_blob)))
+            f.write(table_blob)
+            for blob in blobs:
+                f.write(blob)
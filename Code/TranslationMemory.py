@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+import time
+
+from Code.Metrics import metrics
+from Code.config import Config, Paths
+
+class TranslationMemory:
+    """On-disk cache of machine translations keyed by source text, engine and target language."""
+
+    # SQLite caps the number of bound parameters per statement
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, path=Paths.TRANSLATION_MEMORY, max_entries=Config.TRANSLATION_MEMORY_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Keys stored during this run: they were counted as misses when they were looked up the first time
+        self._stored = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source, engine, target_lang)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)")
+        self._conn.commit()
+
+    def get(self, text, engine, target_lang):
+        return self.get_many([text], engine, target_lang).get(text)
+
+    def get_many(self, texts, engine, target_lang, track=True) -> dict:
+        """Return {text: translation} for every text found in memory.
+        With track=False the lookup doesn't count towards the hit/miss counters (used for planning). Texts
+        translated earlier in the run (e.g. by the translation plan) don't count as hits, every text is counted once."""
+        texts = list(dict.fromkeys(texts))
+        found = {}
+        with self._lock:
+            for i in range(0, len(texts), self.QUERY_CHUNK_SIZE):
+                chunk = texts[i:i + self.QUERY_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT source, translation FROM translations "
+                    f"WHERE engine = ? AND target_lang = ? AND source IN ({placeholders})",
+                    [engine, target_lang, *chunk]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE source = ? AND engine = ? AND target_lang = ?",
+                    [(now, text, engine, target_lang) for text in found]
+                )
+                self._conn.commit()
+
+            if track:
+                hits = sum((text, engine, target_lang) not in self._stored for text in found)
+                self.hits += hits
+                self.misses += len(texts) - len(found)
+        if track:
+            metrics.count("memory hits", hits)
+        return found
+
+    def put(self, text, engine, target_lang, translation):
+        self.put_many({text: translation}, engine, target_lang)
+
+    def put_many(self, translations:dict, engine, target_lang):
+        rows = [(text, engine, target_lang, translated, time.time())
+                for text, translated in translations.items() if isinstance(translated, str)]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (source, engine, target_lang, translation, last_used) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+            self._stored.update((text, engine, target_lang) for text, engine, target_lang, _, _ in rows)
+
+    def _evict(self):
+        # Drop the least recently used entries once the memory grows past its bound
+        count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)", (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        print(f"       ├─ 🧠 Translation memory: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self)} entries stored")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
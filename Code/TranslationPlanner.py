@@ -0,0 +1,150 @@
+import json
+import os
+import time
+
+from Code.FieldHashStore import FieldHashStore
+from Code.TranslatedCache import TranslatedCache
+from Code.config import Config, Paths
+
+class TranslationPlan:
+    """Unique strings that still need the external API, grouped by engine, plus per-file statistics."""
+    def __init__(self):
+        self.files = {}                                 # file -> {'entries', 'fields', 'local', 'api'}
+        self.work = {"deepl": set(), "google": set()}    # engine -> unique texts to send
+        self.cached = {"deepl": 0, "google": 0}          # engine -> unique texts already in translation memory
+        self.api_fields = 0                              # API-bound field values before de-duplication
+        self.deepl_usage = None                          # (count, limit) from DeepL, if available
+        self.entries = {}                                # file -> JP entries the plan was made from, for the translation stage
+
+    def characters(self, engine) -> int:
+        return sum(len(text) for text in self.work[engine])
+
+    def report(self):
+        print("       ├─ 📋 Translation plan")
+        for filename, stats in self.files.items():
+            print(f"            ├─ {filename}: {stats['entries']} entries, {stats['fields']} fields "
+                  f"({stats['local']} local, {stats['api']} to translate)")
+
+        unique = sum(len(texts) for texts in self.work.values())
+        print(f"            ├─ 🔢 {unique} unique strings to send ({self.api_fields} API-bound fields before de-duplication)")
+        for engine, texts in self.work.items():
+            print(f"                ├─ {engine}: {len(texts)} strings, {self.characters(engine)} characters "
+                  f"({self.cached[engine]} already in translation memory)")
+
+        if self.deepl_usage is not None:
+            count, limit = self.deepl_usage
+            if limit is None:
+                print(f"            ├─ ℹ️ DeepL usage: {count} characters used, limit unknown")
+            else:
+                remaining = limit - count
+                after = remaining - self.characters("deepl")
+                print(f"            ├─ ℹ️ DeepL quota: {remaining} characters left, {after} projected after this run")
+                if after < 0:
+                    print(f"            ├─ ⚠️ The DeepL quota won't cover this run. {-after} characters short")
+
+class TranslationPlanner:
+    """Walks the files about to be translated, applies the local dictionaries and collects the
+    strings left for DeepL/Google, de-duplicated across every entry and file."""
+
+    def __init__(self, translator, cache=None, field_hashes=None):
+        self.translator = translator
+        self.cache = cache or TranslatedCache()
+        self.field_hashes = field_hashes or FieldHashStore()
+
+    def plan(self, files) -> TranslationPlan:
+        """files: list of (filename, JP source path or its already loaded entries) about to go through __translate_file."""
+        print("\n    ℹ️ Planning translation")
+        start_time = time.time()
+        plan = TranslationPlan()
+
+        kept_bytes = 0
+        for filename, source_path in files:
+            name_only = os.path.splitext(filename)[0]
+            if isinstance(source_path, str):
+                with open(source_path, 'r', encoding='utf8') as f:
+                    jp_data = json.load(f)
+                # Past PLAN_KEEP_MAX_BYTES of JSON the translation stage parses the file again instead
+                size = os.path.getsize(source_path)
+                if kept_bytes + size <= Config.PLAN_KEEP_MAX_BYTES:
+                    kept_bytes += size
+                    plan.entries[name_only] = jp_data
+            else:
+                jp_data = source_path
+                plan.entries[name_only] = jp_data
+            translated_ids = self.__translated_ids(name_only)
+            pending = [entry for entry in jp_data if entry["id"] not in translated_ids]
+            values = [(key, entry[key]) for entry in pending for key in Config.FIELDS_TO_TRANSLATE if key in entry]
+            values += self.__changed_values(name_only, jp_data, translated_ids)
+            self.__plan_values(plan, name_only, len(pending), values)
+
+        # Strings already in the translation memory won't be sent again
+        for engine, texts in plan.work.items():
+            cached = self.translator.memory.get_many(texts, engine, self.translator._target_lang(engine), track=False)
+            plan.cached[engine] = len(cached)
+            texts.difference_update(cached)
+
+        plan.deepl_usage = self.__deepl_usage()
+
+        end_time = time.time()
+        elapsed = end_time - start_time
+        print(f"       ├─ ✅ Finished planning in {elapsed:.2f}s.")
+        return plan
+
+    def execute(self, plan:TranslationPlan):
+        """Send every unique string once. Results land in the translation memory, where the
+        per-file translation picks them up."""
+        print(f"\n    ℹ️ Translating {sum(len(texts) for texts in plan.work.values())} unique strings")
+        start_time = time.time()
+        for engine, texts in plan.work.items():
+            if texts:
+                self.translator.translate_texts(engine, sorted(texts))
+        end_time = time.time()
+        elapsed = end_time - start_time
+        print(f"       ├─ ✅ Finished translating unique strings in {elapsed:.2f}s.")
+
+    def __plan_values(self, plan, name_only, entry_count, values):
+        engine, _ = self.translator._engine_for(name_only)
+        stats = {"entries": entry_count, "fields": 0, "local": 0, "api": 0}
+        for field, value in values:
+            if not value or not isinstance(value, str):
+                continue
+            stats["fields"] += 1
+            if self.translator.translate_locally(name_only, field, value, count=False) is not None:
+                stats["local"] += 1
+            else:
+                stats["api"] += 1
+                plan.work[engine].add(value)
+        plan.api_fields += stats["api"]
+        plan.files[name_only] = stats
+
+    def __translated_ids(self, name_only) -> set:
+        translated_ids = set()
+        try:
+            translated_ids = set(self.cache.ids(name_only))
+        except json.JSONDecodeError:
+            pass
+        journal_path = os.path.join(Paths.JOURNAL_DIR, f"{name_only}.jsonl")
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r', encoding='utf8') as f:
+                for line in f:
+                    try:
+                        translated_ids.add(json.loads(line)["id"])
+                    except json.JSONDecodeError:
+                        break
+        return translated_ids
+
+    def __changed_values(self, name_only, jp_data, translated_ids) -> list:
+        # Edited text in already translated entries, as __translate_file will pick it up
+        changes = self.field_hashes.diff(name_only, jp_data)
+        return [(field, entry[field]) for entry in jp_data if entry["id"] in changes and entry["id"] in translated_ids
+                for field in changes[entry["id"]]]
+
+    def __deepl_usage(self):
+        if Config.DEEPL_API_KEY == "YOUR API KEY HERE" or self.translator.translator_deepl is None:
+            return None
+        try:
+            usage = self.translator.translator_deepl.get_usage()
+            return usage.character.count, usage.character.limit
+        except Exception as e:
+            print(f"            ├─ ⚠️ Couldn't get DeepL usage: {e}")
+            return None
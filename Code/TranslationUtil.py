@@ -1,79 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import cached_property
 import json
 import os
 from pathlib import Path
 import shutil
 import time
-from typing import Any, List
+from typing import Any, Iterable, List, Tuple
+from Code.FieldHashStore import FieldHashStore
+from Code.FileHash import atomic_write, file_digest
 from Code.Helper import Helper
+from Code.MastersManifest import MastersManifest
+from Code.Metrics import metrics
+from Code.TranslatedCache import TranslatedCache
 from Code.UnityHelper import UnityHelper
 from Code.config import Config, Paths
 from Code.Translator import Translator
+from Code.TranslationPlanner import TranslationPlan, TranslationPlanner
 
 class Translator_Util:
     
     def __init__(self):
         self.translator = Translator()
-        self.helper = Helper()
-
-    def __translate_file(self, filename:str, path:str):
+        self.manifest = MastersManifest()
+        self.cache = TranslatedCache()
+        self.field_hashes = FieldHashStore()
+        self.planner = TranslationPlanner(self.translator, self.cache, self.field_hashes)
+
+    # The character lookups are only needed once something gets translated
+    @cached_property
+    def helper(self) -> Helper:
+        return Helper()
+
+    @metrics.timed("translate", profile=True)
+    def __translate_file(self, filename:str, path:str, jp_data:list = None):
         print(f"       ├─ 🔁 Translating file {filename}.")
         start_time = time.time()
         source_path = os.path.join(path, f'{filename}')
         out_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, f'{filename}')
-        temp_path = out_path + '.tmp'
-        
+
         name_only = os.path.splitext(filename)[0]
         new_entries_path = os.path.join(Paths.NEW_ENTRIES_DIR, f"{name_only}_new_entries.json")
-
-        # Load JP source (list of entries)
-        with open(source_path, 'r', encoding='utf8') as f:
-            jp_data = json.load(f)
-
-        # Load existing translated data if any (resume support)
-        translated_data = []
+        journal_path = os.path.join(Paths.JOURNAL_DIR, f"{name_only}.jsonl")
+
+        # Load JP source (list of entries), unless the extraction handed it over already
+        if jp_data is None:
+            with open(source_path, 'r', encoding='utf8') as f:
+                jp_data = json.load(f)
+            metrics.count("bytes read", os.path.getsize(source_path))
+
+        # Track already translated IDs to skip. They come from the compiled cache, the JSON itself is
+        # only parsed when new entries have to be written to it
+        translated_ids = set()
+        existing_decoded = True
         if os.path.exists(out_path):
             try:
-                with open(out_path, 'r', encoding='utf8') as f:
-                    translated_data = json.load(f)
+                translated_ids = set(self.cache.ids(name_only))
             except json.JSONDecodeError:
+                existing_decoded = False
                 print("            ├─ ⚠️ Couldn't decode existing output file. Starting from scratch.")
+        existing_count = len(translated_ids)
 
-        # Track already translated IDs to skip
-        translated_ids = {entry["id"] for entry in translated_data}
-
-        count = 0
-        new_count = 0
+        # Resume support: replay entries journaled by an interrupted run
         new_entries = []
-        for entry in jp_data:
-            count += 1
-            if entry["id"] in translated_ids:
-                continue
-
-            merged = entry.copy()
+        for entry in self.helper.read_journal(journal_path):
+            if entry["id"] not in translated_ids:
+                translated_ids.add(entry["id"])
+                new_entries.append(entry)
+        if new_entries:
+            print(f"            ├─ ♻️ Resumed {len(new_entries)} entries from {journal_path}")
+
+        pending = [entry for entry in jp_data if entry["id"] not in translated_ids]
+        new_count = len(new_entries)
+        untranslated_count = 0
+        chunk_size = Config.TRANSLATION_CHUNK_SIZE
+        for start in range(0, len(pending), chunk_size):
+            chunk = [entry.copy() for entry in pending[start:start + chunk_size]]
+
+            # Translate the chunk one field at a time so misses go out in batches
+            untranslated = set()
             for key in Config.FIELDS_TO_TRANSLATE:
-                if key in merged and merged[key] != '':
-                    translated = self.translator.translate(name_only, key, merged[key])
-                    merged[key] = translated
-
-            translated_data.append(merged)
-            new_entries.append(merged) #track additions
-            new_count += 1
-
-            # Periodic save every 100 entries
-            if count % 100 == 0:
-                try:
-                    with open(temp_path, 'w', encoding='utf8') as f:
-                        json.dump(translated_data, f, ensure_ascii=False, indent=2)
-                    shutil.move(temp_path, out_path)
-                except Exception as e:
-                    print(f"            ├─ ❌ Error writing progress: {e}")
-                    if os.path.exists(temp_path):
-                        print(f"            ├─ ⚠️ Temp file preserved at: {temp_path}")
-
-        # Final save
-        with open(out_path, 'w', encoding='utf8') as f:
-            json.dump(translated_data, f, ensure_ascii=False, indent=2)
+                targets = [merged for merged in chunk if key in merged and merged[key] != '']
+                if not targets:
+                    continue
+                metrics.count("fields translated", len(targets))
+                translated = self.translator.translate_many(name_only, key, [merged[key] for merged in targets])
+                for merged, value in zip(targets, translated):
+                    if value is None and merged[key] is not None:
+                        untranslated.add(id(merged))
+                    merged[key] = value
+
+            # Entries with a text no engine could translate are not kept: they stay pending for the next run
+            if untranslated:
+                chunk = [merged for merged in chunk if id(merged) not in untranslated]
+                untranslated_count += len(untranslated)
+            metrics.count("entries translated", len(chunk))
+            new_entries.extend(chunk) #track additions
+            new_count += len(chunk)
+
+            # Save progress after every chunk. Only the new entries are appended to the journal
+            try:
+                self.helper.append_journal(chunk, journal_path)
+            except Exception as e:
+                print(f"            ├─ ❌ Error writing progress: {e}")
+
+        # Fields of the already translated entries whose JP text changed since they were translated
+        changes = {}
+        if existing_count and existing_decoded:
+            with metrics.span("diff"):
+                changes = self.field_hashes.diff(name_only, jp_data)
+            metrics.count("entries checked", existing_count)
+
+        # Compact the journal (and the changes) into the translated file once at the end
+        changed_entries = []
+        if new_count > 0 or changes:
+            translated_data = []
+            if existing_count and existing_decoded:
+                with open(out_path, 'r', encoding='utf8') as f:
+                    translated_data = json.load(f)
+            if changes:
+                changed_entries, untranslated_changes = self.__translate_file_changes(translated_data, changes, jp_data, name_only)
+                untranslated_count += untranslated_changes
+            translated_data.extend(new_entries)
+            self.helper.safe_save_json(translated_data, out_path)
+            if name_only == 'character':
+                self.helper.character_file_updated(new_entries + changed_entries)
+        # The JP text the translated file now corresponds to. With texts left untranslated the previous
+        # hashes are kept, so the next run finds the same changes again, and the master is retried
+        if not untranslated_count:
+            self.field_hashes.update(name_only, jp_data)
+        Config.set_untranslated(name_only, untranslated_count > 0)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
 
         # Save just the new entries to a separate file
         if new_entries and name_only in Config.FILES_TO_TRACK_NEW_ENTRIES:
@@ -82,84 +140,64 @@ class Translator_Util:
 
         end_time = time.time()
         elapsed = end_time - start_time
-        print(f"            ├─ 📝 Finished translating file {filename}: {len(translated_data)} total entries written to {out_path} in {elapsed:.2f}s")
+        print(f"            ├─ 📝 Finished translating file {filename}: {existing_count + new_count} total entries written to {out_path} in {elapsed:.2f}s")
         if new_count > 0:
             print(f"                ├─ 🛠️ Added {new_count} new lines to the file")
-
-    def __translate_file_changes(self, source_data:dict[Any, Any], updated_data:dict[Any, Any], filename):
+        if changed_entries:
+            print(f"                ├─ 🛠️ Re-translated {len(changed_entries)} entries whose JP text changed")
+        if untranslated_count:
+            print(f"                ├─ ⚠️ {untranslated_count} entries or fields left untranslated, retried on the next run")
+
+    # Re-translate the changed fields (from the field hash store) in place in translated_data.
+    # Returns the updated entries and how many fields no engine could translate
+    def __translate_file_changes(self, translated_data:list, changes:dict[Any, list], jp_data:list, filename):
         print(f"       ├─ 🔁 Checking {filename} for updates.")
         start_time = time.time()
 
-        # Load existing translated data
-        out_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, f'{filename}.json')  
-        if os.path.exists(out_path):
-            with open(out_path, 'r', encoding='utf8') as f:
-                translated_data = json.load(f)
-                # Create a lookup dictionary by 'id' (so you can easily access by 'id')
-                translated_data_lookup = {entry["id"]: entry for entry in translated_data}
-        else:
-            translated_data = []
-        
-        updated_count = 0
-        updated_character_ids = []
-
-        for id_, old_entry in source_data.items():
-            if id_ not in updated_data:
-                continue  # Entry was removed in JP (unlikely, but safe check)
-
-            new_entry = updated_data[id_]
-            #translated_entry = translated_data.get(id_, new_entry.copy())
-            translated_entry = translated_data_lookup[id_]
-
-            entry_updated = False
-            for field in Config.FIELDS_TO_CHECK_FOR_UPDATES:
-                if field in new_entry:
-                    old_value = old_entry.get(field)
-                    new_value = new_entry.get(field)
-
-                    if old_value != new_value:
-
-                        if filename == "leaderskill":
-                            char = self.helper.find_character_by_leaderskill_id(new_entry['id'])
-                            if char is not None:
-                                if char['id'] not in updated_character_ids:
-                                    updated_character_ids.append(char['id'])
-                            char_name = 'N/A' if char is None else char['name']
-                            print(f"            ├─ ℹ️  Updating Evility {translated_entry['name']} with ID: {id_} for Character: {char_name}")
-
-                        elif filename == "command":
-                            char = self.helper.find_character_by_command_id(new_entry['id'])
-                            if char is not None:
-                                if char['id'] not in updated_character_ids:
-                                    updated_character_ids.append(char['id'])
-                            char_name = 'N/A' if char is None else char['name']
-                            print(f"            ├─ ℹ️  Updating Skill {translated_entry['name']} with ID: {id_} for Character: {char_name}")                     
-
-                        print(f"                ├─ Old Value: {translated_entry[field]}")
-                        translated_text = self.translator.translate(filename=filename, field=field, value=new_value)
-                        if translated_text:
-                            translated_entry[field] = translated_text
-                            print(f"                ├─ New Value: {translated_text}")
-                            updated_count += 1
-                            entry_updated = True
-                        else:
-                            print(f"⚠️ No translation for ID {id_} field '{field}': {new_value}")    
-                        
-            # Update the entry directly in the translated_data dictionary
-            #if entry_updated:                
-            #    translated_data[id_] = translated_entry  # Replace the old entry with the updated one
+        translated_data_lookup = {entry["id"]: entry for entry in translated_data}
+        jp_data_lookup = {entry["id"]: entry for entry in jp_data if entry["id"] in changes}
 
-            #updated_translated_data.append(translated_entry)
-
-        # Save updated translation file
-        out_path = os.path.join(Paths.SOURCE_TRANSLATED_DIR, f'{filename}.json')
-        # with open(out_path, 'w', encoding='utf8') as f:
-        #     json.dump(translated_data, f, ensure_ascii=False, indent=2)
-        self.helper.safe_save_json(translated_data, out_path)
+        # Grouped by field so the misses go out in batches, like new entries
+        targets = {}  # field -> [(translated entry, new JP value)]
+        for id_, fields in changes.items():
+            translated_entry = translated_data_lookup.get(id_)
+            if translated_entry is None:
+                continue  # Only in the journal or lost from the translated file, handled as a new entry
+            for field in fields:
+                targets.setdefault(field, []).append((translated_entry, jp_data_lookup[id_][field]))
 
+        updated_entries = {}
+        updated_count = 0
+        untranslated_count = 0
+        for field, field_targets in targets.items():
+            translations = self.translator.translate_many(filename, field, [value for _, value in field_targets])
+            for (translated_entry, new_value), translated_text in zip(field_targets, translations):
+                id_ = translated_entry["id"]
+                if filename == "leaderskill":
+                    char = self.helper.find_character_by_leaderskill_id(id_)
+                    char_name = 'N/A' if char is None else char['name']
+                    print(f"            ├─ ℹ️  Updating Evility {translated_entry.get('name')} with ID: {id_} for Character: {char_name}")
+                elif filename == "command":
+                    char = self.helper.find_character_by_command_id(id_)
+                    char_name = 'N/A' if char is None else char['name']
+                    print(f"            ├─ ℹ️  Updating Skill {translated_entry.get('name')} with ID: {id_} for Character: {char_name}")
+
+                if translated_text or not new_value:
+                    if filename in Config.FILES_TO_CHECK_FOR_UPDATES:
+                        print(f"                ├─ Old Value: {translated_entry.get(field)}")
+                        print(f"                ├─ New Value: {translated_text}")
+                    translated_entry[field] = translated_text
+                    updated_entries[id_] = translated_entry
+                    updated_count += 1
+                else:
+                    untranslated_count += 1
+                    print(f"⚠️ No translation for ID {id_} field '{field}': {new_value}")
+
+        metrics.count("fields changed", updated_count)
         end_time = time.time()
         elapsed = end_time - start_time
-        print(f"            ├─ 🛠️ Finihed checking {filename}: {updated_count} entries updated in {elapsed:.2f}s")
+        print(f"            ├─ 🛠️ Finihed checking {filename}: {updated_count} fields updated in {elapsed:.2f}s")
+        return list(updated_entries.values()), untranslated_count
  
     def __patch_new_entries(self, new_entries_file, source_file, filename):
         source_data_lookup = {entry["id"]: entry for entry in source_file}
@@ -193,16 +231,85 @@ class Translator_Util:
         #     json.dump(translated_data, f, ensure_ascii=False, indent=2)
         self.helper.safe_save_json(patched_source, out_path)
     
-    # in case the initial files are not up to date. Look for new entries, translate and update our translations
-    def initial_translation(self):
-        print(f"\n    ℹ️ Running initial translation")
-        start_time = time.time()
+    # Files in Updated_Files the translation stage will go through
+    def files_to_translate(self, initial:bool) -> List[str]:
+        updated_files = Config.get_updated_files()
+        filenames = []
         for filename in os.listdir(Paths.UPDATED_FILES_DIR):
             file_path = os.path.join(Paths.UPDATED_FILES_DIR, filename)
+            name_only = os.path.splitext(filename)[0]
+
             # Skip subfolders
             if not os.path.isfile(file_path):
                 continue
-            self.__translate_file(filename=filename, path=Paths.UPDATED_FILES_DIR)
+
+            if initial or (name_only in Config.FILES_TO_TRANSLATE and name_only in updated_files):
+                filenames.append(filename)
+        return filenames
+
+    # Work out what the translation stage will send to DeepL/Google, before spending any quota
+    @metrics.timed("plan", profile=True)
+    def plan_translation(self, initial:bool, extracted:dict = None) -> TranslationPlan:
+        """extracted: {name: entries} already in memory (find_updated_files, the masters read for an initial dry run), planned instead of the files in Updated_Files."""
+        if extracted is not None:
+            files = [(f"{name}.json", entries) for name, entries in extracted.items() if initial or name in Config.FILES_TO_TRANSLATE]
+        else:
+            files = [(filename, os.path.join(Paths.UPDATED_FILES_DIR, filename)) for filename in self.files_to_translate(initial)]
+        plan = self.planner.plan(files)
+        plan.report()
+        return plan
+
+    # Send the planned unique strings once, ahead of the per-file translation
+    @metrics.timed("translate", profile=True)
+    def execute_plan(self, plan:TranslationPlan):
+        self.planner.execute(plan)
+
+    # Translate several files at once and yield each filename once it is done. Files spend most of their time
+    # waiting on the engines, whose rate limits and circuit breakers (RequestScheduler) are shared by all of them.
+    # Each file keeps its own journal, output and New_Entries file
+    # extracted: {name: JP entries} already in memory (handed over and dropped as each file starts), the others are read from path
+    def __translate_files(self, filenames:List[str], path:str, extracted:dict = None):
+        extracted = extracted if extracted is not None else {}
+
+        # character.json feeds the character lookups (Helper) of the leaderskill/command update logs. It is
+        # translated first, on its own, so they don't resolve character names from a stale index
+        first = [filename for filename in filenames if os.path.splitext(filename)[0] == 'character']
+        filenames = [filename for filename in filenames if filename not in first]
+        for filename in first:
+            self.__translate_file(filename, path=path, jp_data=extracted.pop(os.path.splitext(filename)[0], None))
+            yield filename
+
+        workers = min(Config.TRANSLATION_FILE_WORKERS, len(filenames))
+        if workers <= 1:
+            for filename in filenames:
+                self.__translate_file(filename, path=path, jp_data=extracted.pop(os.path.splitext(filename)[0], None))
+                yield filename
+            return
+
+        # Built once here instead of by whichever worker gets there first: cached_property doesn't lock
+        # (Python 3.12+), several workers could each build their own and race on their index files.
+        # The Google clients are per thread already
+        self.helper
+        self.translator.dict_translator
+        self.translator.effect_translator
+        if Config.DEEPL_API_KEY != "YOUR API KEY HERE":
+            self.translator.translator_deepl
+        # Largest files first, so the run ends close to the time of the largest one
+        filenames = sorted(filenames, key=lambda filename: os.path.getsize(os.path.join(path, filename)), reverse=True)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.__translate_file, filename, path, extracted.pop(os.path.splitext(filename)[0], None)): filename
+                       for filename in filenames}
+            for future in as_completed(futures):
+                future.result()
+                yield futures[future]
+
+    # in case the initial files are not up to date. Look for new entries, translate and update our translations.
+    # extracted: the entries the translation plan was made from, so the files aren't parsed again
+    def initial_translation(self, extracted:dict = None):
+        print(f"\n    ℹ️ Running initial translation")
+        start_time = time.time()
+        for filename in self.__translate_files(self.files_to_translate(initial=True), Paths.UPDATED_FILES_DIR, extracted):
+            file_path = os.path.join(Paths.UPDATED_FILES_DIR, filename)
 
             ## Keep leaderkill and command files on source folder
             ## They become the new source to compare against on future updates
@@ -216,8 +323,11 @@ class Translator_Util:
         elapsed = end_time - start_time
         print(f"       ├─ ✅ Completed initial translation in {elapsed:.2f}s.")
 
-    # Look for files changed after last execution
-    def find_updated_files(self):     
+    # Look for files changed after last execution and extract them
+    def find_updated_files(self, dry_run:bool = False) -> Tuple[List[str], dict]:
+        """Returns (updated files, {name: extracted DataList}), the extracted entries go on to the planning and the translation.
+        With dry_run the masters are only read in memory: config.json, the backups, Updated_Files, New_Entries
+        and the manifest are left as they are."""
         # Get last run time so we can look for updated files
         timestamp = Config.get_datetime_field(Config.LAST_EXECUTION)
         if timestamp is None:
@@ -226,30 +336,39 @@ class Translator_Util:
         print(f'\n    ℹ️  Looking for files updated after {timestamp.strftime("%Y-%m-%d %H:%M:%S")}')
         start_time = time.time()
 
-        #Reset config
         updated_files = []
-        Config.set_updated_files(updated_files)
-
-        # Delete backups before generating new files
-        source_dir = Path(Paths.MASTERS_BACKUP)
-        for file in source_dir.iterdir():
-            if file.is_file():
-                file.unlink()
-
-        source_dir = Path(Paths.NEW_ENTRIES_DIR)
-        for file in source_dir.iterdir():
-            if file.is_file():
-                file.unlink()
-
-        # 🔁 Walk through all files in the masters folder
-        for filename in os.listdir(Paths.GAME_MASTERS):
+        if not dry_run:
+            #Reset config
+            Config.set_updated_files(updated_files)
+            Config.flush()
+
+            # Delete backups before generating new files
+            source_dir = Path(Paths.MASTERS_BACKUP)
+            for file in source_dir.iterdir():
+                if file.is_file():
+                    file.unlink()
+
+            source_dir = Path(Paths.NEW_ENTRIES_DIR)
+            for file in source_dir.iterdir():
+                if file.is_file():
+                    file.unlink()
+
+        # 🔁 Walk through the masters we translate. A file only counts as updated when its content changed
+        unseen_files = []
+        for filename in Config.FILES_TO_TRANSLATE + ['charactercommand']:
             file_path = os.path.join(Paths.GAME_MASTERS, filename)
 
-            # Skip subfolders
+            # Skip missing files and subfolders
             if not os.path.isfile(file_path):
                 continue
 
-            # Get last modified time
+            if self.manifest.has(filename):
+                if self.manifest.is_changed(filename):
+                    updated_files.append(filename)
+                continue
+
+            # Not in the manifest yet: fall back to the last modified time
+            unseen_files.append(filename)
             mtime = os.path.getmtime(file_path)
             modified_date = datetime.fromtimestamp(mtime)
 
@@ -257,44 +376,58 @@ class Translator_Util:
             if modified_date > timestamp:
                 updated_files.append(filename)
 
+        # Masters the last run left texts untranslated in go through the translation again
+        for filename in sorted(Config.get_untranslated_files()):
+            if filename not in updated_files and os.path.isfile(os.path.join(Paths.GAME_MASTERS, filename)):
+                updated_files.append(filename)
+
         # 🖨️ Print or use the list
         print("            ├─  🔁 Files updated since last execution:")
         for f in updated_files:
             print(f"                 ├─  📦 {f}")
 
-        unity_helper = UnityHelper()
-        unity_helper.datamine_files(updated_files)   
+        if dry_run:
+            return updated_files, UnityHelper().read_masters(updated_files) if updated_files else {}
+
+        extracted = UnityHelper().datamine_files(updated_files) if updated_files else {}
         Config.set_updated_files(updated_files)
+        Config.flush()
+        # Baseline for bundles seen for the first time. Updated ones are recorded once installed (or at the
+        # end of the run), so an interrupted run picks them up again
+        self.manifest.record(set(unseen_files) - set(updated_files))
 
         end_time = time.time()
         elapsed = end_time - start_time
         print(f"       ├─ ✅ Finished looking for updated files in {elapsed:.2f}s.")   
+        return updated_files, extracted
 
-    # translate updated files
-    def translate_updated_files(self):
+    # translate updated files. extracted: {name: entries} returned by find_updated_files, so the files aren't parsed again
+    def translate_updated_files(self, extracted:dict = None):
 
         print(f"\n    ℹ️  Translating updated files")
         start_time = time.time()
-        updated_files = Config.get_updated_files()
 
-        for filename in os.listdir(Paths.UPDATED_FILES_DIR):
+        for filename in self.__translate_files(self.files_to_translate(initial=False), Paths.UPDATED_FILES_DIR, extracted):
             file_path = os.path.join(Paths.UPDATED_FILES_DIR, filename)
             name_only = os.path.splitext(filename)[0]
 
-            # Skip subfolders
-            if not os.path.isfile(file_path):
-                continue
-
-            if name_only in Config.FILES_TO_TRANSLATE and name_only in updated_files:
-                self.__translate_file(filename, path=Paths.UPDATED_FILES_DIR)
-
-                if name_only not in Config.FILES_TO_CHECK_FOR_UPDATES:
-                    os.remove(file_path)   
+            if name_only not in Config.FILES_TO_CHECK_FOR_UPDATES:
+                os.remove(file_path)   
 
         end_time = time.time()
         elapsed = end_time - start_time
         print(f"       ├─ ✅ Finished translating updated files in {elapsed:.2f}s.")  
 
+    # Translate one extracted file (new entries and changed fields) and keep it in Source if needed. Used by the
+    # streaming pipeline, which passes the extracted entries along so Updated_Files isn't parsed again
+    def translate_updated_file(self, filename:str, entries:list = None):
+        name_only = os.path.splitext(filename)[0]
+        self.__translate_file(filename, path=Paths.UPDATED_FILES_DIR, jp_data=entries)
+        if name_only in Config.FILES_TO_CHECK_FOR_UPDATES:
+            self.__move_to_source(filename)
+        else:
+            os.remove(os.path.join(Paths.UPDATED_FILES_DIR, filename))
+
     # translate updated files
     def patch_new_entries(self, filenames:List[str]):
 
@@ -325,60 +458,90 @@ class Translator_Util:
         elapsed = end_time - start_time
         print(f"├─ ✅ Finished translating updated files in {elapsed:.2f}s.")  
 
-    def find_and_translate_file_changes(self):
+    # Move one extracted file to Source, where it is the previous extract for the next update.
+    # Its changed fields were already re-translated by __translate_file
+    def __move_to_source(self, updated_file:str):
+        updated_file_path = os.path.join(Paths.UPDATED_FILES_DIR, updated_file)
+        updated_file_name = os.path.splitext(updated_file)[0]
 
-        print(f"\n    ℹ️  Looking for character updates")
-        start_time = time.time()
-
-        for updated_file in os.listdir(Paths.UPDATED_FILES_DIR):
-            updated_file_path = os.path.join(Paths.UPDATED_FILES_DIR, updated_file)
-            updated_file_name = os.path.splitext(updated_file)[0]
+        original_file_path = os.path.join(Paths.SOURCE_DIR, updated_file)
 
-            original_file_path = os.path.join(Paths.SOURCE_DIR, updated_file)
-
-            # Skip subfolders
-            if not os.path.isfile(original_file_path):
-                continue
+        # Skip subfolders
+        if not os.path.isfile(original_file_path):
+            return
 
-            if updated_file_name in Config.FILES_TO_CHECK_FOR_UPDATES:
+        # Move files to source for the next update
+        destination_folder = Paths.SOURCE_DIR
+        os.makedirs(destination_folder, exist_ok=True)
+        destination_path = os.path.join(destination_folder, f'{updated_file_name}.json')
+        # Move the file
+        shutil.move(updated_file_path, destination_path)
 
-                # Load updated data
-                with open(updated_file_path, 'r', encoding='utf8') as f:
-                    updated_data = {entry["id"]: entry for entry in json.load(f)}
+    # Run after the translation: the extracts left in Updated_Files become the baseline of the next update
+    def move_extracts_to_source(self):
 
-                # Load source data
-                with open(original_file_path, 'r', encoding='utf8') as f:
-                    source_data = {entry["id"]: entry for entry in json.load(f)}
-
-                self.__translate_file_changes(source_data=source_data, updated_data=updated_data, filename=updated_file_name)
+        print(f"\n    ℹ️  Moving extracted files to Source")
+        start_time = time.time()
 
-            # Move files to source for the next update
-            destination_folder = Paths.SOURCE_DIR
-            os.makedirs(destination_folder, exist_ok=True)
-            destination_path = os.path.join(destination_folder, f'{updated_file_name}.json')
-            # Move the file
-            shutil.move(updated_file_path, destination_path)
+        for updated_file in os.listdir(Paths.UPDATED_FILES_DIR):
+            self.__move_to_source(updated_file)
 
         end_time = time.time()
         elapsed = end_time - start_time
-        print(f"       ├─ ✅ Finished looking for character updates in {elapsed:.2f}s.")  
+        print(f"       ├─ ✅ Finished moving extracted files to Source in {elapsed:.2f}s.")
 
-    def update_game_files(self, files_to_update:List[str] = None):
+    def update_game_files(self, files_to_update:Iterable[str] = None) -> dict:
+        """Install the generated bundles into the game masters folder.
+        Returns the install manifest: {file name: {"hash", "installed"}}, installed being False for
+        bundles the game folder already has byte for byte."""
         print(f"\n    ℹ️ Updating game files")
+        start_time = time.time()
         source_dir = Path(Paths.TRANSLATED_FILES_DIR)
         target_dir = Path(Paths.GAME_MASTERS)
 
         # Ensure the destination exists
         target_dir.mkdir(parents=True, exist_ok=True)
 
-        # Copy all files (ignoring subdirectories)
-        for file in source_dir.iterdir():
-            if file.is_file():
-                if files_to_update is None or file.stem in files_to_update:
-                    target_file = target_dir / file.name
-                    shutil.copy2(file, target_file)
-                    print(f"       ├─ 🔁 Copied {file.name} to {target_file}")
-        print("   ├─ ✅ Finished updating game files.")
+        # Copy all files (ignoring subdirectories and unfinished writes)
+        install_manifest = {}
+        try:
+            for file in sorted(source_dir.iterdir()):
+                if file.is_file() and file.suffix != '.tmp':
+                    if files_to_update is None or file.stem in files_to_update:
+                        install_manifest[file.name] = self.install_game_file(file, target_dir)
+        finally:
+            # Our own copies must not be seen as game updates next time, also when interrupted halfway
+            self.manifest.record(install_manifest, {name: entry["hash"] for name, entry in install_manifest.items()})
+
+        installed = sum(entry["installed"] for entry in install_manifest.values())
+        elapsed = time.time() - start_time
+        print(f"   ├─ ✅ Finished updating game files: {installed} installed, "
+              f"{len(install_manifest) - installed} already up to date in {elapsed:.2f}s.")
+        return install_manifest
+
+    # Copy one generated bundle into the game masters folder, unless the installed one has the same content
+    @metrics.timed("install", profile=True)
+    def install_game_file(self, file:Path, target_dir:Path = None) -> dict:
+        """Returns the install manifest entry of the file: {"hash": content hash, "installed": whether it was copied}."""
+        target_dir = target_dir or Path(Paths.GAME_MASTERS)
+        target_file = target_dir / file.name
+        digest = file_digest(file)
+        metrics.count("bytes read", file.stat().st_size)
+        if target_file.is_file():
+            # The masters manifest usually knows the installed hash already, saving a read of the game file
+            installed_digest = self.manifest.digest(file.name) if target_dir == self.manifest.masters_path else file_digest(target_file)
+            if installed_digest == digest:
+                metrics.count("bundles up to date")
+                return {"hash": digest, "installed": False}
+
+        # The game never sees a partially written bundle
+        with atomic_write(target_file, 'wb') as f, file.open('rb') as source:
+            shutil.copyfileobj(source, f)
+        shutil.copystat(file, target_file)
+        metrics.count("bundles installed")
+        metrics.count("bytes written", target_file.stat().st_size)
+        print(f"       ├─ 🔁 Copied {file.name} to {target_file}")
+        return {"hash": digest, "installed": True}
 
     def update_game_textures(self, files_to_update:List[str] = None):
         print(f"\n    ℹ️ Updating game assets")
@@ -1,106 +1,319 @@
+from bisect import bisect_right
+from collections import deque
 import os
 import json
 import re
-import time
-from deep_translator import GoogleTranslator
-import deepl
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from functools import cached_property
 
-from Code.config import Config, Paths
+from Code.DictionarySnapshot import DictionarySnapshot
+from Code.Metrics import metrics
+from Code.RequestScheduler import FATAL, RATE_LIMITED, TRANSIENT, EngineUnavailable, RequestScheduler
+from Code.TemplateIndex import TemplateIndex, normalize
+from Code.config import Config
+from Code.TranslationMemory import TranslationMemory
 
 class DictionaryTranslator:
     def __init__(self):
-        folder_path = Paths.DICTIONARIES_DIR
-        self.dictionary = {}
-        if os.path.exists(folder_path):
-            for filename in os.listdir(folder_path):
-                if filename.endswith('.json'):  # Only load .json files
-                    file_path = os.path.join(folder_path, filename)
-                    with open(file_path, 'r', encoding='utf8') as f:
-                        try:
-                            dict_data = json.load(f)
-                            self.dictionary.update(dict_data)  # Merge dictionary
-                        except json.JSONDecodeError:
-                            print(f"Warning: Skipping invalid JSON file {filename}")
+        # Merged from Dictionaries/ and compiled once, see DictionarySnapshot
+        snapshot = DictionarySnapshot().load()
+        self.dictionary = snapshot["dictionary"]
+        # Fallbacks for texts that only differ from an entry by width or spacing, then also by numbers or placeholders
+        self.normalized = snapshot["normalized"]
+        self.templates = TemplateIndex.restore(snapshot["templates"], snapshot["ambiguous"])
+        self.__last_lookup = (None, None)
+
+    def __fallback_translate(self, jp_text):
+        # has() and translate() are called back to back on the same text, don't match it twice
+        last_text, translated = self.__last_lookup
+        if last_text != jp_text:
+            translated = self.normalized.get(normalize(jp_text))
+            if translated is None:
+                translated = self.templates.translate(jp_text)
+            self.__last_lookup = (jp_text, translated)
+        return translated
 
     def translate(self, jp_text):
-        return self.dictionary.get(jp_text)
+        translated = self.dictionary.get(jp_text)
+        if translated is None and isinstance(jp_text, str):
+            translated = self.__fallback_translate(jp_text)
+        return translated
 
     def has(self, jp_text):
-        return jp_text in self.dictionary
+        return jp_text in self.dictionary or (isinstance(jp_text, str) and self.__fallback_translate(jp_text) is not None)
 
 class EffectTranslator:
+    """Replaces known effect phrases, longest key first.
+
+    The keys are compiled into an Aho-Corasick automaton, so one left-to-right pass finds every
+    key present in the text. Only the keys that were found get applied, in the same order as the
+    old one-regex-per-key loop. The text is only rescanned after a replacement whose output can
+    combine with the surrounding text into a new match (e.g. '[Party]' after '連撃[')."""
+
     def __init__(self, path='./PatternDictionaries/EffectDictionary.json'):
         self.replacements = []
         if os.path.exists(path):
             with open(path, 'r', encoding='utf8') as f:
                 raw_dict = json.load(f)
-                # Sort keys by length desc so longer matches replace first
-                # Compile regex patterns for better performance
-                self.replacements = sorted(
-                    [(re.compile(re.escape(k)), v) for k, v in raw_dict.items()],
-                    key=lambda x: len(x[0].pattern),
-                    reverse=True
-                )
+                # Sort keys by length desc so longer matches replace first. Length is measured on the
+                # escaped pattern, as the dictionary was tuned against the old per-pattern regex loop
+                self.replacements = sorted(raw_dict.items(), key=lambda x: len(re.escape(x[0])), reverse=True)
+        self.__build_automaton()
+        self.__find_bridges()
+
+    def __build_automaton(self):
+        # Trie: one dict of char -> state per state, plus the key ranks ending at each state
+        self.goto = [{}]
+        self.outputs = [[]]
+        for rank, (key, _) in enumerate(self.replacements):
+            state = 0
+            for char in key:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(rank)
+
+        # Breadth-first pass to set failure links and inherit the outputs of suffix states
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def __find_bridges(self):
+        # bridges[rank] is True when the replacement for that key can take part in a match of a later key
+        def can_bridge(value, key):
+            if key in value or value in key:
+                return True
+            overlap = range(1, min(len(key), len(value)))
+            return any(value.endswith(key[:n]) or value.startswith(key[-n:]) for n in overlap)
+
+        self.bridges = [
+            any(can_bridge(value, later_key) for later_key, _ in self.replacements[rank + 1:])
+            for rank, (_, value) in enumerate(self.replacements)
+        ]
+
+    def __find_matches(self, text, after_rank):
+        """Return every (rank, start) match of a key ranked after after_rank, sorted."""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for rank in outputs[state]:
+                if rank > after_rank:
+                    matches.append((rank, position + 1 - len(self.replacements[rank][0])))
+        matches.sort()
+        return matches
 
     def translate(self, text):
-        result = text
-        for pattern, replacement in self.replacements:
-            result = pattern.sub(replacement, result)
-        return result
+        matches = self.__find_matches(text, -1)
+        while matches:
+            rank = matches[0][0]
+            key, value = self.replacements[rank]
+            length = len(key)
+
+            # Leftmost non-overlapping occurrences, as re.sub would pick them
+            starts = []
+            for match_rank, start in matches:
+                if match_rank != rank:
+                    break
+                if not starts or start >= starts[-1] + length:
+                    starts.append(start)
+
+            parts = []
+            last = 0
+            for start in starts:
+                parts.append(text[last:start])
+                parts.append(value)
+                last = start + length
+            parts.append(text[last:])
+            text = ''.join(parts)
+
+            if self.bridges[rank]:
+                matches = self.__find_matches(text, rank)
+                continue
+
+            # Nothing new can match, so shift the remaining matches and drop the ones that were overwritten
+            shift = len(value) - length
+            remaining = []
+            for match_rank, start in matches:
+                if match_rank == rank:
+                    continue
+                replaced_before = bisect_right(starts, start)
+                if replaced_before and start < starts[replaced_before - 1] + length:
+                    continue
+                if replaced_before < len(starts) and starts[replaced_before] < start + len(self.replacements[match_rank][0]):
+                    continue
+                remaining.append((match_rank, start + shift * replaced_before))
+            matches = remaining
+        return text
 
 class Translator:
+    DEEPL_TARGET_LANG = "EN-US"
+    GOOGLE_TARGET_LANG = "en"
+
     def __init__(self):
-        self.dict_translator = DictionaryTranslator()
-        self.effect_translator = EffectTranslator()
+        self.memory = TranslationMemory()
         # Placeholder for external services
         self.files_for_deepl = ['stage', 'character', 'memory', 'episode', 'command']
-        self.translator_google = GoogleTranslator(source='auto', target='en')
-        self.translator_deepl = deepl.Translator(Config.DEEPL_API_KEY)
-        # Validate DeepL key
+        self._google_clients = threading.local()
+        self.scheduler = self._build_scheduler()
+
+    # Lookup tables and engine clients are only built (and deepl/deep_translator imported) on first use.
+    # A DeepL key is validated by its first request: an invalid key disables DeepL for the run
+    @cached_property
+    def dict_translator(self):
+        return DictionaryTranslator()
+
+    @cached_property
+    def effect_translator(self):
+        return EffectTranslator()
+
+    @property
+    def translator_google(self):
+        # One client per thread: deep_translator keeps the parameters of the current request on the instance
+        client = getattr(self._google_clients, "client", None)
+        if client is None:
+            from deep_translator import GoogleTranslator
+            client = self._google_clients.client = GoogleTranslator(source='auto', target=self.GOOGLE_TARGET_LANG)
+        return client
+
+    @cached_property
+    def translator_deepl(self):
+        import deepl
         try:
-            self.translator_deepl = deepl.Translator(Config.DEEPL_API_KEY)
-            # Test request to validate the key
-            usage = self.translator_deepl.get_usage()
-            if usage.character.limit is None:
-                print("⚠️  DeepL API key is valid, but usage limits are unknown.")
-        except deepl.exceptions.AuthorizationException:
-            print("       ├─ ❌ Invalid DeepL API key. Please check your configuration.")
-            self.translator_deepl = None
+            return deepl.Translator(Config.DEEPL_API_KEY)
         except Exception as e:
             print(f"⚠️  Failed to initialize DeepL translator: {e}")
-            self.translator_deepl = None
+            return None
 
+    def _build_scheduler(self):
+        # DeepL falls back to Google when it is degraded or out of quota, and the other way around
+        scheduler = RequestScheduler(
+            engines={"deepl": self._translate_deepl, "google": self._translate_google_batch},
+            classify=self._classify_error,
+            fallbacks={"deepl": ["google"], "google": ["deepl"]},
+            # deep_translator's translate_batch sends one request per text
+            costs={"google": len},
+        )
+        if Config.DEEPL_API_KEY == "YOUR API KEY HERE":
+            scheduler.disable("deepl", "not configured")
+        return scheduler
 
-    def translate(self, filename, field, value) -> str:
-        if not value or not isinstance(value, str):
-            return value
-
+    def translate_locally(self, filename, field, value, count:bool = True):
+        """Translate with the local rules only. Returns None when the external API is needed.
+        With count=False the lookup isn't counted in the run report (used for planning)."""
         # RULE: For "command" file, use regex-based EffectTranslator on 'description'
         if filename == "command" and field == "description_effect":
+            if count:
+                metrics.count("effect hits")
             return self.effect_translator.translate(value)
 
         # RULE: For other fields, try DictionaryTranslator first
         if self.dict_translator.has(value):
+            if count:
+                metrics.count("dictionary hits")
             return self.dict_translator.translate(value)
+        return None
+
+    def translate_many(self, filename, field, values) -> list:
+        """Translate a list of values, sending the misses to the external API in batches.
+        The output keeps the order of the input values. Values no engine could translate come back as None."""
+        results = list(values)
+        pending = {}  # text -> positions waiting for it
+        for i, value in enumerate(results):
+            if not value or not isinstance(value, str):
+                continue
+            local = self.translate_locally(filename, field, value)
+            if local is not None:
+                results[i] = local
+            else:
+                pending.setdefault(value, []).append(i)
+
+        if not pending:
+            return results
+
+        engine, _ = self._engine_for(filename)
+        translations = self.translate_texts(engine, list(pending))
+        for text, positions in pending.items():
+            for i in positions:
+                results[i] = translations.get(text)
+
+        return results
+
+    def translate_texts(self, engine, texts) -> dict:
+        """Translate unique texts with the given engine ("deepl" or "google"), memory first.
+        Returns {text: translation}. Texts no engine could translate are left out and logged."""
+        target_lang = self._target_lang(engine)
+        translations = self.memory.get_many(texts, engine, target_lang)
+        texts = [text for text in dict.fromkeys(texts) if text not in translations]
+        metrics.count("api texts", len(texts))
+        if not texts:
+            return translations
 
-        # If no match found, fallback to external API
+        size = Config.TRANSLATION_BATCH_SIZE
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+
+        with ThreadPoolExecutor(max_workers=Config.TRANSLATION_WORKERS) as executor:
+            futures = [executor.submit(self.scheduler.translate, engine, batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    used_engine, translated = future.result()
+                except EngineUnavailable as e:
+                    metrics.count("untranslated texts", len(batch))
+                    print(f"            ├─ ⚠️ Left {len(batch)} texts untranslated, they will be retried next run: {e}")
+                    continue
+                batch_translations = dict(zip(batch, translated))
+                # Stored under the engine that actually translated, a fallback doesn't shadow the preferred engine
+                self.memory.put_many(batch_translations, used_engine, self._target_lang(used_engine))
+                translations.update(batch_translations)
+
+        return translations
+
+    # Returns the (engine, target language) pair used for a file
+    def _engine_for(self, filename):
         if filename in self.files_for_deepl and Config.DEEPL_API_KEY != "YOUR API KEY HERE":
-            return self._translate_deepl(value)
-        else:
-            return self._translate_google(value)
-
-    def _translate_deepl(self, text, max_retries=5, delay=5):
-        for attempt in range(max_retries):
-            try:
-                result = self.translator_deepl.translate_text(text, target_lang="EN-US")
-                return result.text
-            except deepl.DeepLException as e:
-                print(f"Attempt {attempt+1}/{max_retries} failed: {e}")
-                if attempt < max_retries - 1:
-                    print(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                else:
-                    raise  # re-raise the error if out of retries
-
-    def _translate_google(self, text):
-        return self.translator_google.translate(text)
\ No newline at end of file
+            return "deepl", self.DEEPL_TARGET_LANG
+        return "google", self.GOOGLE_TARGET_LANG
+
+    def _target_lang(self, engine):
+        return self.DEEPL_TARGET_LANG if engine == "deepl" else self.GOOGLE_TARGET_LANG
+
+    # Accepts a single text or a list of texts (one request for the whole list). Retries are up to the scheduler
+    def _translate_deepl(self, text):
+        if self.translator_deepl is None:
+            raise EngineUnavailable("DeepL client couldn't be created")
+        result = self.translator_deepl.translate_text(text, target_lang=self.DEEPL_TARGET_LANG)
+        if isinstance(result, list):
+            return [r.text for r in result]
+        return result.text
+
+    def _translate_google_batch(self, texts):
+        return self.translator_google.translate_batch(texts)
+
+    def _classify_error(self, engine, error):
+        import deepl
+        from deep_translator.exceptions import AuthorizationException, TooManyRequests
+        if isinstance(error, (EngineUnavailable, deepl.AuthorizationException, deepl.QuotaExceededException, AuthorizationException)):
+            if isinstance(error, deepl.AuthorizationException):
+                print("       ├─ ❌ Invalid DeepL API key. Please check your configuration.")
+            return FATAL
+        if isinstance(error, (deepl.TooManyRequestsException, TooManyRequests)):
+            return RATE_LIMITED
+        if getattr(error, "http_status_code", None) == 429:
+            return RATE_LIMITED
+        return TRANSIENT
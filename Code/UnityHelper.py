@@ -1,18 +1,26 @@
-import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cached_property
+import glob
 import json
 import os
 from pathlib import Path
 import shutil
 import sys
 import time
-from typing import List
-import UnityPy
+from typing import Iterable
+from Code.BundleWriter import write_bundle
+from Code.MasterIndex import MasterIndex
+from Code.Metrics import metrics
+from Code.TexturePatcher import patch_texture_asset
+from Code.TranslatedCache import TranslatedCache
 from Code.config import Config, Paths
 
+# UnityPy takes a second or more to import and a run with nothing to update never needs it,
+# so it is imported by the functions that load bundles
+
 
 class UnityHelper:
     def __init__(self):
-        self.env = UnityPy.load(Paths.GAME_MASTERS)
         self.masters_path = Path(Paths.GAME_MASTERS) 
         self.game_assets_path = Path(Paths.GAME_ASSETS)   
            
@@ -53,7 +61,23 @@ class UnityHelper:
         self.new_entries_path = Path(Paths.NEW_ENTRIES_DIR)        
         self.new_entries_path.mkdir(parents=True, exist_ok=True)
 
+    @cached_property
+    def index(self) -> MasterIndex:
+        return MasterIndex(self.masters_path)
+
+    # Load only the bundles holding the given masters. Yields (name, env, obj) for each one found
+    def _load_masters(self, names):
+        for name, location in self.index.lookup(names).items():
+            import UnityPy
+            env = UnityPy.load(location["bundle"])
+            obj = next((obj for obj in env.objects if obj.path_id == location["path_id"]), None)
+            if obj is None:
+                print(f"            ├─ ⚠️ Couldn't find {name} in {location['bundle']}")
+                continue
+            yield name, env, obj
+
     # Initial datamine. Returns True if the initial setup was already done. False otherwise
+    @metrics.timed("datamine", profile=True)
     def initial_datamine(self) -> bool:
         """Extract only the missing JSON files from FILES_TO_TRANSLATE."""
 
@@ -65,19 +89,7 @@ class UnityHelper:
             return True
 
         print("       ├─ 🔁 Datamining game files...")
-        for obj in self.env.objects:
-            if obj.type.name != "MonoBehaviour":
-                continue
-
-            if not obj.serialized_type.nodes:
-                continue
-
-            data = obj.read()
-            name = data.m_Name
-
-            if name not in Config.FILES_TO_TRANSLATE and name != 'charactercommand':
-                continue
-
+        for name, env, obj in self._load_masters(Config.FILES_TO_TRANSLATE + ['charactercommand']):
             self._export_json(obj, name, self.updated_files_path)
 
             source_file = self.masters_path / name
@@ -98,89 +110,105 @@ class UnityHelper:
         print(f"       ├─ ✅ Completed initial setup in {elapsed:.2f}s.")
         return False
 
-    # Datamine files specified on a list
-    def datamine_files(self, files_to_datamine:list[str]) -> None:
-        for obj in self.env.objects:
-            if obj.type.name != "MonoBehaviour":
-                continue
-
-            if not obj.serialized_type.nodes:
-                continue
-
-            data = obj.read()
-            name = data.m_Name
-
-            # Datamine updated files and export to updated files folder
-            if name in files_to_datamine and (name in Config.FILES_TO_TRANSLATE or name == 'charactercommand'):
-                self._export_json(obj, name, Paths.UPDATED_FILES_DIR)
-                source_file = self.masters_path / name
-                backup_file = self.backup_path / name
-                # Make sure the backup directory exists
-                backup_file.parent.mkdir(parents=True, exist_ok=True)
-                # Backup file (overwrite if if existed)
-                shutil.copy2(source_file, backup_file)
-                print(f"                 ├─  🔒 Backed up Unity asset to: {backup_file}")
+    # Datamine files specified on a list. Returns {name: DataList} so the data can go to translation without a re-parse
+    @metrics.timed("datamine", profile=True)
+    def datamine_files(self, files_to_datamine:Iterable[str]) -> dict:
+        # Datamine updated files and export to updated files folder
+        names = [name for name in files_to_datamine if name in Config.FILES_TO_TRANSLATE or name == 'charactercommand']
+        extracted = {}
+        for name, env, obj in self._load_masters(names):
+            extracted[name] = self._export_json(obj, name, Paths.UPDATED_FILES_DIR)
+            source_file = self.masters_path / name
+            backup_file = self.backup_path / name
+            # Make sure the backup directory exists
+            backup_file.parent.mkdir(parents=True, exist_ok=True)
+            # Backup file (overwrite if if existed)
+            shutil.copy2(source_file, backup_file)
+            print(f"                 ├─  🔒 Backed up Unity asset to: {backup_file}")
+        return extracted
   
-    # Generate translated game files and place them in the Translated_Files folder
-    def generate_translated_game_files(self, files_to_translate:List[str] = None) -> None:
+    def read_masters(self, names:Iterable[str]) -> dict:
+        """{name: DataList} of the given masters, read in memory only: nothing is exported or backed up."""
+        names = [name for name in names if name in Config.FILES_TO_TRANSLATE or name == 'charactercommand']
+        return {name: obj.read_typetree()['DataList'] for name, env, obj in self._load_masters(names)}
+
+    # Generate translated game files and place them in the Translated_Files folder.
+    # Returns {name: generate_bundle result} of the bundles generated or skipped, the failed ones are left out
+    @metrics.timed("generate", profile=True)
+    def generate_translated_game_files(self, files_to_translate:Iterable[str] = None, workers:int = None) -> dict:
         
         print(f"\n    ℹ️ Generating translated game files")
         start_time = time.time()
 
-        # Delete before generating new files
-        source_dir = Path(Paths.TRANSLATED_FILES_DIR)
-        for file in source_dir.iterdir():
-            if file.is_file():
-                file.unlink()
-
-        for obj in self.env.objects:
-            if obj.type.name == "MonoBehaviour":
-                filename = ''
-                if obj.serialized_type.nodes:            
-                    data = obj.read()
-                    filename = data.m_Name
-                    # If translating only updated files check if the file needs to be translated:
-                    if files_to_translate is not None and filename not in files_to_translate: 
-                        continue
-                    # Check if the file is in the lit of files to translate
-                    if filename not in Config.FILES_TO_TRANSLATE: 
-                        continue
-                    tree = obj.read_typetree()
-
-                    updated = False
-                    translated_data = self.__load_translated_data(filename)
-                    translated_index = {entry["id"]: entry for entry in translated_data}
-
-                    for item in tree['DataList']:
-                        tid = item.get("id")
-                        en_data = translated_index.get(tid)
-                        if en_data is not None:
-                            for key in Config.FIELDS_TO_TRANSLATE:
-                                if key in en_data:
-                                    item[key] = en_data[key]
-                                    updated = True
-                if updated:
-                    obj.save_typetree(tree)
-                    print(f"            ├─ 📦 Generated file: {filename}")
-
-        for path, env_file in self.env.files.items():
-            output_path = os.path.join(Paths.TRANSLATED_FILES_DIR, os.path.basename(path))
-            filename = path[path.rfind('/') + 1:]
-            if files_to_translate is not None and filename not in files_to_translate: 
-                continue
-            if filename in Config.FILES_TO_TRANSLATE:
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                with open(output_path, "wb") as f:
-                    f.write(env_file.save(packer=(64,2)))
-        
+        # Check if the file is in the list of files to translate
+        names = [name for name in Config.FILES_TO_TRANSLATE if files_to_translate is None or name in files_to_translate]
+        locations = self.index.lookup(names)
+        workers = workers or Config.GENERATION_WORKERS
+        compression = Config.BUNDLE_COMPRESSION
+        total = len(locations)
+        failed = []
+        generated = {}
+
+        if workers <= 1 or total <= 1:
+            results = (self.__run_generate_bundle(name, location, compression) for name, location in locations.items())
+            for done, (name, result, error) in enumerate(results, start=1):
+                self._report_generated_bundle(done, total, name, result, error, failed)
+                if error is None:
+                    generated[name] = result
+        else:
+            # Each bundle is independent, so load/patch/recompress them on separate cores
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(generate_bundle, name, location, compression): name
+                           for name, location in locations.items()}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    name = futures[future]
+                    try:
+                        result, error = future.result(), None
+                    except Exception as e:
+                        result, error = None, e
+                    self._report_generated_bundle(done, total, name, result, error, failed)
+                    if error is None:
+                        generated[name] = result
+
+        if failed:
+            print(f"       ├─ ❌ Failed to generate {len(failed)} file(s): {', '.join(failed)}")
+
         end_time = time.time()
         elapsed = end_time - start_time
         print(f"       ├─ ✅ Finished generating translated game files in {elapsed:.2f}s.")
+        return generated
  
-    def find_and_patch_textures(self):
+    def __run_generate_bundle(self, name, location, compression):
+        try:
+            return name, generate_bundle(name, location, compression), None
+        except Exception as e:
+            return name, None, e
+
+    def _report_generated_bundle(self, done, total, name, result, error, failed):
+        if error is None:
+            # Time spent in the worker, the parent only waits for it
+            metrics.record("generate bundle", result["elapsed"])
+            metrics.count("bundles generated" if result["updated"] else "bundles skipped")
+            metrics.count("bytes written", result["bytes"])
+            if result["updated"]:
+                metrics.record("bundle save", result["save_seconds"])
+                metrics.log("bundles", name=name, compression=result["compression"],
+                            save_seconds=round(result["save_seconds"], 6), bytes=result["bytes"])
+        if error is not None:
+            failed.append(name)
+            print(f"            ├─ ❌ [{done}/{total}] Failed to generate {name}: {error}")
+        elif result["updated"]:
+            print(f"            ├─ 📦 [{done}/{total}] Generated file: {name} ({result['changed']} texts) in {result['elapsed']:.2f}s, "
+                  f"saved in {result['save_seconds']:.2f}s ({result['bytes'] / 1024:.0f} KB, {result['compression']})")
+        else:
+            print(f"            ├─ ⏭️ [{done}/{total}] Skipped {name}: no text differs from the game file")
+
+    @metrics.timed("textures", profile=True)
+    def find_and_patch_textures(self, workers:int = None):
 
         start_time = time.time()
         print(f"\n    🔍 Scanning for assets to patch...")
+        assets = []
         for asset_file in self.global_assets_path.rglob("*"):
             if asset_file.is_file():
                 # Reconstruct relative path from assets dir
@@ -206,28 +234,52 @@ class UnityHelper:
                     if not backup_file.exists():
                         shutil.copy2(game_asset_file, backup_file)
                     print(f"                ├─ 🔒 Backed up asset to {relative_path}")
+                    assets.append((str(asset_file), str(game_asset_file), str(relative_path)))
 
-                    # Load both Unity environments
-                    with asset_file.open("rb") as f:
-                        source_env = UnityPy.load(f)
-                    with game_asset_file.open("rb") as f:
-                        target_env = UnityPy.load(f)
-
-                    # Example: Patch textures
-                    self.__patch_textures(source_env, target_env, asset_file.name, relative_path)
+        # Each asset pair is independent, so decode/blit/re-encode them on separate cores
+        workers = workers or Config.GENERATION_WORKERS
+        compression = Config.BUNDLE_COMPRESSION
+        if workers <= 1 or len(assets) <= 1:
+            for asset in assets:
+                try:
+                    result, error = patch_texture_asset(*asset, compression), None
+                except Exception as e:
+                    result, error = None, e
+                self.__report_patched_texture(asset[2], result, error)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(patch_texture_asset, *asset, compression): asset[2] for asset in assets}
+                for future in as_completed(futures):
+                    try:
+                        result, error = future.result(), None
+                    except Exception as e:
+                        result, error = None, e
+                    self.__report_patched_texture(futures[future], result, error)
 
         end_time = time.time()
         elapsed = end_time - start_time
         print(f"       ├─ ✅ Finished patching textures in in {elapsed:.2f}s.")
 
-    def __load_translated_data(self, filename:str):  
-        filepath = os.path.join(Paths.SOURCE_TRANSLATED_DIR, filename + '.json')  
-        with io.open(filepath, encoding='utf8') as fj:
-            translated_source_data=json.load(fj)
-            return translated_source_data
-    
-    def _export_json(self, obj, name: str, path=None) -> None:
-        """Internal helper to write JSON to output folder."""
+    def __report_patched_texture(self, relative_path, result, error):
+        if error is not None:
+            print(f"           ├─ ❌ Failed to patch {relative_path}: {error}")
+            return
+        metrics.record("bundle save", result["save_seconds"])
+        metrics.count("bytes written", result["bytes"])
+        metrics.log("bundles", name=relative_path, compression=result["compression"],
+                    save_seconds=round(result["save_seconds"], 6), bytes=result["bytes"])
+        atlas = "cached EN atlas" if result["cached_atlas"] else "EN atlas decoded"
+        print(f"           ├─ 💾 Patched {result['patched']} sprite(s) in {relative_path} "
+              f"({result['resized']} resized, {atlas}) in {result['elapsed']:.2f}s, "
+              f"saved in {result['save_seconds']:.2f}s ({result['bytes'] / 1024:.0f} KB, {result['compression']})")
+        if result["skipped"]:
+            print(f"                ├─ ⚠️ No EN sprite for: {', '.join(result['skipped'])}")
+
+    def _export_json(self, obj, name: str, path=None) -> list:
+        """Internal helper to write JSON to output folder. Returns the exported DataList.
+
+        Entries are written compact, one per line: the file is about 40% smaller and written twice as fast
+        as the old indented dump. Memory is dominated by the DataList itself, which read_typetree returns whole."""
 
         if path is None:
             path = self.source_path
@@ -235,91 +287,72 @@ class UnityHelper:
         if not isinstance(path, Path):
             path = Path(path)
 
-        tree = obj.read_typetree()
-        output_path = path / f"{name}.json"
-
-        with open(output_path, "wt", encoding="utf8") as f:
-            json.dump(tree['DataList'], f, ensure_ascii=False, indent=4)
-
-        print(f"            ├─ 📝 Extracted: {name}")
-
-
-    def __patch_textures(self, source_env, target_env, filename, relative_path):
-
-        # Map sprites by name from both environments
-        sprites_jp = {}
-        sprites_en = {}
-        patched = 0
-        skipped = []
-        mismatches = []
-
-        # Map sprites by name
-        sprites_jp = {s.m_Name: s for obj in target_env.objects if obj.type.name == "Sprite" for s in [obj.read()]}
-        sprites_en = {s.m_Name: s for obj in source_env.objects if obj.type.name == "Sprite" for s in [obj.read()]}
-
-        # Load textures
-        jp_texture = next((obj.read() for obj in target_env.objects if obj.type.name == "Texture2D"), None)
-        en_texture = next((obj.read() for obj in source_env.objects if obj.type.name == "Texture2D"), None)
-
-        # Pre-convert once
-        jp_img = jp_texture.image.convert("RGBA")
-        en_img = en_texture.image.convert("RGBA")
-
-        for name, jp_sprite in sprites_jp.items():
-            en_sprite = sprites_en.get(name)
-            if not en_sprite:
-                skipped.append(name)
-                continue
-
-            rect_jp = jp_sprite.m_RD.textureRect
-            rect_en = en_sprite.m_RD.textureRect
-
-            if (int(rect_en.width) != int(rect_jp.width)) or (int(rect_en.height) != int(rect_jp.height)):
-                # If sizes don't match, resize the EN texture to match the JP sprite size
-                crop = en_img.crop((
-                    int(rect_en.x),
-                    en_img.height - int(rect_en.y + rect_en.height),
-                    int(rect_en.x + rect_en.width),
-                    en_img.height - int(rect_en.y)
-                ))
-
-                # Resize crop to match JP size (if mismatched)
-                crop_resized = crop.resize((int(rect_jp.width), int(rect_jp.height)))
-
-                # Paste resized crop into JP texture
-                paste_x = int(rect_jp.x)
-                paste_y = jp_img.height - int(rect_jp.y + rect_jp.height)
-                jp_img.paste(crop_resized, (paste_x, paste_y))
-                patched += 1
-            else:
-                # If sizes match, just crop and paste without resizing
-                crop = en_img.crop((
-                    int(rect_en.x),
-                    en_img.height - int(rect_en.y + rect_en.height),
-                    int(rect_en.x + rect_en.width),
-                    en_img.height - int(rect_en.y)
-                ))
-
-                paste_x = int(rect_jp.x)
-                paste_y = jp_img.height - int(rect_jp.y + rect_jp.height)
-                jp_img.paste(crop, (paste_x, paste_y))
-                patched += 1
-
-        # Final save
-        jp_texture.image = jp_img
-        jp_texture.save()
-
-        print(f"                ├─ 💾 Patched {patched} sprite(s)")
-        if mismatches:
-            print(f"                ├─ ❌ Mismatches: {len(mismatches)} → {mismatches}")
-
-        # Step 3: Save the whole environment (updated bundle)
-        output_dir = Paths.PATCHED_TEXTURES
-
-        for path, env_file in target_env.files.items():
-            save_path = output_dir / relative_path
-            # Ensure parent directory exists
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            # Save the modified Unity asset file
-            with open(save_path, "wb") as f:
-                f.write(env_file.save(packer=(64, 2)))
\ No newline at end of file
+        # The span only knows its peak memory under --profile, which traces allocations for the whole run
+        with metrics.span("export json") as span:
+            data = obj.read_typetree()['DataList']
+            output_path = path / f"{name}.json"
+
+            with open(output_path, "wt", encoding="utf8") as f:
+                f.write('[')
+                for i, entry in enumerate(data):
+                    f.write(',\n' if i else '\n')
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n]')
+        metrics.count("entries exported", len(data))
+        metrics.count("bytes written", output_path.stat().st_size)
+
+        memory = f", peak {span.peak_memory / 1024 / 1024:.1f} MB" if span.peak_memory is not None else ""
+        print(f"            ├─ 📝 Extracted: {name} ({len(data)} entries{memory})")
+        return data
+
+
+# Module level so it can run in a worker process
+def generate_bundle(filename:str, location:dict, compression:str = None) -> dict:
+    """Load one master bundle, overlay its translations and save it into Translated_Files.
+    The previous output is removed first, so a bundle that fails or where no text differs anymore (outputs
+    is empty) leaves nothing for the install step.
+    compression is passed explicitly by the parent: a spawned worker doesn't see a Config changed at runtime."""
+    import UnityPy
+    start_time = time.time()
+    # The previous output goes first: if this bundle fails or no longer differs from the game file, the
+    # install step must not pick up a copy made from an older game file
+    previous_output = Path(Paths.TRANSLATED_FILES_DIR) / os.path.basename(location["bundle"])
+    for stale_path in [previous_output, *previous_output.parent.glob(f"{glob.escape(previous_output.name)}.*.tmp")]:
+        if stale_path.is_file():
+            stale_path.unlink()
+
+    env = UnityPy.load(location["bundle"])
+    obj = next((obj for obj in env.objects if obj.path_id == location["path_id"]), None)
+    if obj is None:
+        raise ValueError(f"{filename} not found in {location['bundle']}")
+
+    tree = obj.read_typetree()
+
+    # Only the translated texts, patched where they differ from the game data
+    overlay = TranslatedCache().overlay(filename)
+    changed = 0
+    for item in tree['DataList']:
+        texts = overlay.get(item.get("id"))
+        if not texts:
+            continue
+        for key, text in texts:
+            if item.get(key) != text:
+                item[key] = text
+                changed += 1
+
+    # Nothing differs from the game file: no need to re-save (and later reinstall) the bundle
+    if not changed:
+        return {"updated": False, "changed": 0, "outputs": [], "compression": None, "save_seconds": 0.0,
+                "bytes": 0, "elapsed": time.time() - start_time}
+    obj.save_typetree(tree)
+
+    outputs = []
+    saved = []
+    for path, env_file in env.files.items():
+        output_path = os.path.join(Paths.TRANSLATED_FILES_DIR, os.path.basename(path))
+        saved.append(write_bundle(env_file, output_path, compression))
+        outputs.append(output_path)
+
+    return {"updated": True, "changed": changed, "outputs": outputs, "compression": saved[0]["compression"],
+            "save_seconds": sum(save["save_seconds"] for save in saved), "bytes": sum(save["bytes"] for save in saved),
+            "elapsed": time.time() - start_time}
@@ -2,7 +2,9 @@ from datetime import datetime
 import json
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Optional, Set
+
+from Code.FileHash import atomic_write
 
 class Config:
 
@@ -11,19 +13,39 @@ class Config:
     LAST_EXECUTION = "last_execution_date"
     CONFIG_PATH = 'config.json'
 
+    # Run state, loaded once from config.json and written back by flush()
+    _state = None
+    _dirty = False
+
     @classmethod
-    def _load_config(cls):
-        config_path = Path(cls.CONFIG_PATH)
-        if config_path.exists():
-            with config_path.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+    def _load_config(cls) -> dict:
+        if cls._state is None:
+            cls._state = {}
+            config_path = Path(cls.CONFIG_PATH)
+            if config_path.exists():
+                with config_path.open("r", encoding="utf-8") as f:
+                    cls._state = json.load(f)
+            # Membership is checked in per-object loops, keep it as a set in memory
+            cls._state['updated_files'] = set(cls._state.get('updated_files', []))
+            cls._state['untranslated_files'] = set(cls._state.get('untranslated_files', []))
+        return cls._state
 
     @classmethod
     def _save_config(cls, config: dict):
-        config_path = Path(cls.CONFIG_PATH)
-        with config_path.open("w", encoding="utf-8") as f:
+        cls._state = config
+        cls._dirty = True
+
+    @classmethod
+    def flush(cls):
+        """Write the run state back to config.json if it changed. The file is replaced atomically."""
+        if not cls._dirty:
+            return
+        config = dict(cls._state)
+        config['updated_files'] = sorted(config['updated_files'])
+        config['untranslated_files'] = sorted(config['untranslated_files'])
+        with atomic_write(cls.CONFIG_PATH) as f:
             json.dump(config, f, indent=4)
+        cls._dirty = False
 
     @classmethod
     def get_datetime_field(cls, field_name: str) -> Optional[datetime]:
@@ -47,15 +69,31 @@ class Config:
         cls._save_config(config)
 
     @classmethod
-    def set_updated_files(cls, updated_files: List[str]):
+    def set_updated_files(cls, updated_files: Iterable[str]):
         config = cls._load_config()
-        config['updated_files'] = updated_files
+        config['updated_files'] = set(updated_files)
         cls._save_config(config)
 
     @classmethod
-    def get_updated_files(cls) -> List[str]:
+    def get_updated_files(cls) -> Set[str]:
+        config = cls._load_config()
+        return config['updated_files']
+
+    @classmethod
+    def set_untranslated(cls, name: str, untranslated: bool):
+        """Track the masters with texts no engine could translate, the next update goes through them again."""
         config = cls._load_config()
-        return config.get('updated_files', [])
+        if untranslated != (name in config['untranslated_files']):
+            if untranslated:
+                config['untranslated_files'].add(name)
+            else:
+                config['untranslated_files'].discard(name)
+            cls._save_config(config)
+
+    @classmethod
+    def get_untranslated_files(cls) -> Set[str]:
+        config = cls._load_config()
+        return config['untranslated_files']
         
     FILES_TO_TRANSLATE =  [
         'achievement', 'agenda', 'area', 'arenacategory', 'beginnermission',
@@ -91,6 +129,8 @@ class Config:
             'stageenemygroup', 'story', 'storycharacter', 'storytalk', 'stopnotificationterm'
           ]
 
+    # Masters whose previous extract is kept in Source. Changed fields of every master are found with the
+    # field hash store, Source only seeds it for masters that don't have one yet
     FILES_TO_CHECK_FOR_UPDATES =  ['command', 'leaderskill']
 
     FILES_TO_TRACK_NEW_ENTRIES =  ['command', 'leaderskill', 'character', 'characterclassname', 'item']
@@ -103,7 +143,41 @@ class Config:
         'resource_name', 'sheet_name', 'title'
     ]
 
-    FIELDS_TO_CHECK_FOR_UPDATES = [ 'description', 'description_effect' ]
+    # Machine translation batching. DeepL accepts up to 50 texts per request
+    TRANSLATION_BATCH_SIZE = 50
+    TRANSLATION_WORKERS = 4
+    # Files translated at the same time by the sequential update and the initial translation. 1 translates one file at a time
+    TRANSLATION_FILE_WORKERS = 4
+    # Requests per second allowed for each engine. The rate is halved when an engine answers 429 and
+    # recovers on success, down to ENGINE_MIN_RATE_RATIO of the configured value
+    ENGINE_RATE_LIMITS = {"deepl": 5.0, "google": 5.0}
+    ENGINE_MIN_RATE_RATIO = 0.1
+    # Retries per batch, with exponential backoff (seconds) and jitter
+    ENGINE_MAX_RETRIES = 5
+    ENGINE_BACKOFF_BASE = 1.0
+    ENGINE_BACKOFF_MAX = 60.0
+    # Consecutive failures before an engine's batches go to the other engine, and seconds before it is tried again
+    CIRCUIT_BREAKER_THRESHOLD = 5
+    CIRCUIT_BREAKER_COOLDOWN = 120.0
+    # Entries translated between progress saves
+    TRANSLATION_CHUNK_SIZE = 500
+    # JSON read by the translation planner is kept in memory for the translation stage up to this many bytes,
+    # the files past it are parsed again
+    PLAN_KEEP_MAX_BYTES = 256 * 1024 * 1024
+
+    # Max entries kept in the local translation memory before the least recently used are evicted
+    TRANSLATION_MEMORY_MAX_ENTRIES = 200000
+
+    # Worker processes used to regenerate master bundles and patch textures. 1 disables the process pool
+    GENERATION_WORKERS = os.cpu_count() or 1
+    # How regenerated masters and patched textures are compressed: "legacy" (LZ4 blocks, uncompressed header,
+    # what was always written), "original" (same as the game's bundle), "lz4" or "none" (bigger, fastest to save)
+    BUNDLE_COMPRESSION = "legacy"
+
+    # Updated masters extract, translate and regenerate as overlapping stages instead of one stage at a time.
+    # The queue size bounds how many extracted masters can wait for translation
+    STREAMING_PIPELINE = True
+    PIPELINE_QUEUE_SIZE = 2
 
 class Paths:
     CONFIG_PATH = Path("config.json")
@@ -117,14 +191,26 @@ class Paths:
     MASTERS_BACKUP = "./Masters_Backup"
     ASSETS_BACKUP = "./Assets_Backup"
     PATCHED_TEXTURES = "Patched_Textures"
+    CACHE_DIR = "./Cache"
+    TRANSLATION_MEMORY = "./Cache/translation_memory.db"
+    JOURNAL_DIR = "./Cache/Journals"
+    PROFILES_DIR = "./Profiles"
+    MASTER_INDEX = "./Cache/master_index.json"
+    MASTERS_MANIFEST = "./Cache/masters_manifest.json"
+    RELATION_INDEX = "./Cache/relation_index.json"
+    COMPILED_SOURCE_DIR = "./Cache/Compiled"
+    DICTIONARY_SNAPSHOT = "./Cache/dictionary.bin"
+    DICTIONARY_SHADOWS = "./Cache/dictionary_shadows.json"
+    FIELD_HASHES_DIR = "./Cache/FieldHashes"
+    ATLAS_CACHE_DIR = "./Cache/Atlases"
     GAME_ASSETS = os.path.join(
-        os.getenv("LOCALAPPDATA").replace("Local", "LocalLow"),
+        os.getenv("LOCALAPPDATA", "").replace("Local", "LocalLow"),
         "disgaearpg",
         "DisgaeaRPG",
         "assetbundle"
     )
     GAME_MASTERS = os.path.join(
-        os.getenv("LOCALAPPDATA").replace("Local", "LocalLow"),
+        os.getenv("LOCALAPPDATA", "").replace("Local", "LocalLow"),
         "disgaearpg",
         "DisgaeaRPG",
         "assetbundle",
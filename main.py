@@ -1,40 +1,116 @@
 import time
+# Taken before the project imports so the startup report includes them
+STARTUP_TIME = time.perf_counter()
+import argparse
+from Code.BundleWriter import PACKERS
+from Code.Metrics import metrics
+from Code.Pipeline import StreamingPipeline
 from Code.TranslationUtil import Translator_Util
 from Code.UnityHelper import UnityHelper
-from Code.config import Config
+from Code.config import Config, Paths
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Translate Disgaea RPG JP game files to english.")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Stop after planning: report what would be sent to DeepL/Google and the projected DeepL quota")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Run the update stages one after the other instead of the streaming pipeline")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"Trace memory and write a JSON run report (stage times, counters, peak memory) to {Paths.PROFILES_DIR}")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="Like --profile, plus a cProfile dump per stage (open with pstats or snakeviz)")
+    parser.add_argument('--compression', choices=list(PACKERS),
+                        help=f"How regenerated bundles are compressed (default: {Config.BUNDLE_COMPRESSION}). "
+                             "legacy: LZ4 blocks, original: same as the game's bundle, lz4: LZ4 blocks and header, none: uncompressed")
+    return parser.parse_args()
 
 def main():
 
+    args = parse_args()
+    profile = args.profile or args.cprofile
+    if args.compression:
+        Config.BUNDLE_COMPRESSION = args.compression
+    if profile:
+        metrics.start(profile_stages=args.cprofile)
+    try:
+        with metrics.span("run"):
+            run(args)
+    finally:
+        if profile:
+            print(f"📊 Run report written to {metrics.save(Paths.PROFILES_DIR, settings={'bundle_compression': Config.BUNDLE_COMPRESSION})}")
+
+def run(args):
     start_time = time.time()
     
     print(f"Started execution")
     
     unity_helper = UnityHelper()
     
-    #STEP 1 - DATAMINE GAME FILES   
-    initial_setup_done = unity_helper.initial_datamine()
+    #STEP 1 - DATAMINE GAME FILES. A dry run only reads them in memory further down
+    if args.dry_run:
+        initial_setup_done = Config.get_datetime_field(Config.INITIAL_SETUP) is not None
+    else:
+        initial_setup_done = unity_helper.initial_datamine()
     translator_helper = Translator_Util()
+    startup_time = time.perf_counter() - STARTUP_TIME
+    metrics.record("startup", startup_time)
+    print(f"       ├─ ⏱️ Startup took {startup_time:.2f}s")
 
 
     #STEP 2 - TRANSLATE FILES    
     # 2 - 1: INITIAL SETUP NEEDED. PATCH EVERYTHING FROM SOURCE_TRANSLATED
     if initial_setup_done == False:
-        translator_helper.initial_translation()
-        translator_helper.find_and_translate_file_changes() # Look for changes to existing entries
+        if args.dry_run:
+            # Planned from the masters read in memory: Updated_Files and the backups stay as they are
+            translator_helper.plan_translation(initial=True, extracted=unity_helper.read_masters(Config.FILES_TO_TRANSLATE))
+            print("✅ Dry run finished, nothing was translated")
+            return
+        plan = translator_helper.plan_translation(initial=True)
+        translator_helper.execute_plan(plan) # Send each unique string once
+        translator_helper.initial_translation(plan.entries) # The entries the plan was read from aren't parsed again
+        translator_helper.move_extracts_to_source() # Keep the extracts as the baseline of the next update
         unity_helper.generate_translated_game_files() # Generate new game files
         translator_helper.update_game_files() # Update game files
 
     # 2 - 2: INITIAL SETUP ALREADY DONE. LOOK FOR UPDATED FILES
-    else:       
-        translator_helper.find_updated_files() # look for updated files
-        translator_helper.translate_updated_files() # translate new entries
-        translator_helper.find_and_translate_file_changes() # Look for changes to existing entries
-        unity_helper.generate_translated_game_files(Config.get_updated_files()) # Generate new game files only for updated files
-        translator_helper.update_game_files(Config.get_updated_files()) # Update game files
+    else:
+        # look for updated files and extract them. A dry run reads them in memory: Updated_Files, New_Entries
+        # and config.json stay as they are
+        updated_files, extracted = translator_helper.find_updated_files(dry_run=args.dry_run)
+
+        if not updated_files:
+            print("✅ Nothing changed since last execution")
+            if args.dry_run:
+                return
+
+        else:
+            plan = translator_helper.plan_translation(initial=False, extracted=extracted)
+            if args.dry_run:
+                print("✅ Dry run finished, nothing was translated")
+                return
+            translator_helper.execute_plan(plan) # Send each unique string once
+
+            if Config.STREAMING_PIPELINE and not args.sequential:
+                # Translate, generate and install each updated file while the next one is in progress
+                StreamingPipeline(unity_helper, translator_helper).run(updated_files, extracted)
+
+            else:
+                translator_helper.translate_updated_files(extracted) # translate new entries
+                translator_helper.move_extracts_to_source() # Keep the extracts as the baseline of the next update
+                generated = unity_helper.generate_translated_game_files(Config.get_updated_files()) # Generate new game files only for updated files
+                translator_helper.update_game_files(generated) # Update game files, the installed ones are recorded in the manifest
+                # Also handled: the bundles where no text differs from the game file and the masters we only extract.
+                # A master that failed isn't recorded, so the next run picks it up again
+                translator_helper.manifest.record([name for name, result in generated.items() if not result["outputs"]]
+                                                  + list(Config.get_updated_files() - set(Config.FILES_TO_TRANSLATE)))
     
+    translator_helper.translator.memory.report()
+    translator_helper.translator.scheduler.report()
+
     if initial_setup_done == False:
         Config.set_datetime_field(Config.INITIAL_SETUP)
     Config.set_datetime_field(Config.LAST_EXECUTION)
+    Config.flush()
     
     end_time = time.time()
     elapsed = end_time - start_time